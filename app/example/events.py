@@ -0,0 +1,213 @@
+# An append-only log of the samples models learn from (x, y, and the models
+# they were for), in SQLite with a write-ahead log, so appending a learn is
+# cheap and readers do not block it. Every few events we also save a snapshot
+# of each model. A model can be rebuilt by replaying the events after its
+# last snapshot (or all of them, into a new model, e.g., after the code for
+# it changed), in batches with learn_many if it can. Compaction deletes the
+# events every model has a snapshot past (but keeps the most recent), and old
+# snapshots, so a rebuild replays a bounded number of events.
+
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from lammps_stream_ml import models
+
+from app.example.grid import get_setting
+
+schema = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    x TEXT NOT NULL,
+    y REAL NOT NULL,
+    models TEXT
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    model TEXT NOT NULL,
+    event INTEGER NOT NULL,
+    created REAL NOT NULL,
+    state BLOB NOT NULL,
+    PRIMARY KEY (model, event)
+);
+"""
+
+
+class EventLog:
+    """
+    The log of learn events and snapshots, with a connection for each thread.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.local = threading.local()
+
+    def is_enabled(self):
+        return bool(self.path or get_setting("LAMMPS_EVENT_LOG", None))
+
+    def connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            path = self.path or get_setting("LAMMPS_EVENT_LOG", None)
+            conn = sqlite3.connect(path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(schema)
+            self.local.conn = conn
+        return conn
+
+    def append(self, x, y, names=None):
+        """
+        Record a sample before the models (all, or those named) learn it.
+
+        We return the id of the event, which counts up from 1.
+        """
+        conn = self.connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO events (created, x, y, models) VALUES (?, ?, ?, ?)",
+                (
+                    time.time(),
+                    json.dumps(x, separators=(",", ":")),
+                    y,
+                    json.dumps(names) if names else None,
+                ),
+            )
+        return cursor.lastrowid
+
+    def iter_events(self, name=None, after=0, until=None):
+        """
+        Events (id, x, y) after an id (and up to another), in order.
+
+        With a name, only the events for that model.
+        """
+        query = "SELECT id, x, y, models FROM events WHERE id > ?"
+        params = [after]
+        if until is not None:
+            query += " AND id <= ?"
+            params.append(until)
+        rows = self.connect().execute(query + " ORDER BY id", params)
+        for event, x, y, names in rows:
+            if name is None or names is None or name in json.loads(names):
+                yield event, json.loads(x), y
+
+    def snapshot(self, name, event, model):
+        """
+        Save the state of a model after it learned the events up to event.
+        """
+        conn = self.connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+                (name, event, time.time(), pickle.dumps(model)),
+            )
+
+    def is_due(self, event):
+        return event % get_setting("LAMMPS_EVENT_SNAPSHOT_EVERY", 100) == 0
+
+    def get_snapshot(self, name, until=None):
+        """
+        The last snapshot of a model (up to an event), as (event, model).
+
+        This is (0, None) if there is none.
+        """
+        query = "SELECT event, state FROM snapshots WHERE model = ?"
+        params = [name]
+        if until is not None:
+            query += " AND event <= ?"
+            params.append(until)
+        row = (
+            self.connect()
+            .execute(query + " ORDER BY event DESC LIMIT 1", params)
+            .fetchone()
+        )
+        return (row[0], pickle.loads(row[1])) if row else (0, None)
+
+    def rebuild(self, name, model=None, batch_size=1, until=None):
+        """
+        Rebuild a model from its last snapshot and the events after it.
+
+        If we are given a (new) model it learns all the events we still have.
+        We return the model, the event it starts from, how many it learned,
+        and the last event it learned.
+        """
+        start = 0
+        if model is None:
+            start, model = self.get_snapshot(name, until)
+            if model is None:
+                raise ValueError(f"There is no snapshot of {name} to rebuild from")
+            first = self.connect().execute("SELECT MIN(id) FROM events").fetchone()[0]
+            if first is not None and first > start + 1:
+                raise ValueError(f"The events after snapshot {start} were compacted")
+        found = list(self.iter_events(name, start, until))
+        models.learn(model, [(x, y) for _, x, y in found], batch_size=batch_size)
+        return model, start, len(found), found[-1][0] if found else start
+
+    def compact(self, names):
+        """
+        Delete the events every model has a snapshot past, and old snapshots.
+
+        A model with no snapshot yet (e.g., it was just created) does not
+        hold back compaction, since it has nothing to rebuild from. We keep
+        the most recent LAMMPS_EVENT_LOG_KEEP events (so a new model can
+        still learn from them), and LAMMPS_EVENT_SNAPSHOTS_KEEP snapshots of
+        each model. We return the number of events deleted.
+        """
+        conn = self.connect()
+        covered = [
+            conn.execute(
+                "SELECT MAX(event) FROM snapshots WHERE model = ?", (name,)
+            ).fetchone()[0]
+            for name in names
+        ]
+        covered = [event for event in covered if event is not None]
+        last = conn.execute("SELECT MAX(id) FROM events").fetchone()[0] or 0
+        until = min(
+            min(covered, default=0), last - get_setting("LAMMPS_EVENT_LOG_KEEP", 10000)
+        )
+        keep = get_setting("LAMMPS_EVENT_SNAPSHOTS_KEEP", 2)
+        with conn:
+            deleted = conn.execute(
+                "DELETE FROM events WHERE id <= ?", (until,)
+            ).rowcount
+            conn.execute(
+                """
+                DELETE FROM snapshots WHERE event NOT IN (
+                    SELECT event FROM snapshots AS kept
+                    WHERE kept.model = snapshots.model
+                    ORDER BY event DESC LIMIT ?
+                )
+                """,
+                (keep,),
+            )
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
+
+    def is_compaction_due(self, event):
+        return event % get_setting("LAMMPS_EVENT_COMPACT_EVERY", 1000) == 0
+
+    def summary(self):
+        conn = self.connect()
+        count, first, last = conn.execute(
+            "SELECT COUNT(*), MIN(id), MAX(id) FROM events"
+        ).fetchone()
+        snapshots = {
+            name: {"count": count, "last": event}
+            for name, count, event in conn.execute(
+                "SELECT model, COUNT(*), MAX(event) FROM snapshots GROUP BY model"
+            )
+        }
+        path = conn.execute("PRAGMA database_list").fetchone()[2]
+        return {
+            "events": count,
+            "first": first,
+            "last": last,
+            "snapshots": snapshots,
+            "bytes": os.path.getsize(path) if path else None,
+        }
+
+
+events = EventLog()
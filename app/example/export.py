@@ -0,0 +1,87 @@
+# A compact representation of a linear model (and the StandardScaler in front
+# of it, if any) that a client can use to predict without asking the server.
+# A prediction is then (x - mean) / sqrt(var) for each feature, times the
+# weights, plus the intercept. Other models (e.g., trees) are not exported.
+
+import hashlib
+import json
+import numbers
+
+from river import linear_model, preprocessing
+
+linear_models = (
+    linear_model.LinearRegression,
+    linear_model.PARegressor,
+    linear_model.BayesianLinearRegression,
+)
+
+
+def get_value(value):
+    """
+    A float from a running statistic (older river keeps stats, not floats).
+    """
+    return float(value if isinstance(value, numbers.Number) else value.get())
+
+
+def get_scaler(scaler):
+    """
+    Mean and variance of each feature the scaler has seen.
+    """
+    if getattr(scaler, "window_size", None) is not None:
+        return None
+    means = {name: get_value(mean) for name, mean in scaler.means.items()}
+    if not scaler.with_std:
+        return {"means": means, "vars": None}
+    return {
+        "means": means,
+        "vars": {name: get_value(var) for name, var in scaler.vars.items()},
+    }
+
+
+def get_weights(model):
+    """
+    Weights and intercept of a linear model.
+
+    BayesianLinearRegression predicts with the mean of the posterior, which it
+    does not expose, so we ask for the prediction for each feature alone.
+    """
+    if isinstance(model, linear_model.BayesianLinearRegression):
+        names = getattr(model, "_idx", None) or getattr(model, "_m", None) or {}
+        return {name: float(model.predict_one({name: 1.0})) for name in names}, 0.0
+    return {name: float(w) for name, w in model.weights.items()}, float(
+        model.intercept
+    )
+
+
+def export_model(model):
+    """
+    The model as json (with a version), or None if we cannot export it.
+    """
+    steps = list(getattr(model, "steps", {"model": model}).values())
+    scaler = None
+    if len(steps) == 2 and isinstance(steps[0], preprocessing.StandardScaler):
+        scaler = get_scaler(steps.pop(0))
+        if scaler is None:
+            return None
+    if len(steps) != 1 or not isinstance(steps[0], linear_models):
+        return None
+
+    weights, intercept = get_weights(steps[0])
+    features = sorted(set(weights) | set(scaler["means"] if scaler else []))
+    exported = {
+        "kind": type(steps[0]).__name__,
+        "features": features,
+        "weights": [weights.get(name, 0.0) for name in features],
+        "intercept": intercept,
+        "means": None,
+        "vars": None,
+    }
+    if scaler is not None:
+        exported["means"] = [scaler["means"].get(name, 0.0) for name in features]
+        if scaler["vars"] is not None:
+            exported["vars"] = [scaler["vars"].get(name, 0.0) for name in features]
+
+    # The version changes when (and only when) the exported values change
+    content = json.dumps(exported, sort_keys=True).encode("utf-8")
+    exported["version"] = hashlib.sha256(content).hexdigest()[:16]
+    return exported
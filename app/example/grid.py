@@ -0,0 +1,205 @@
+# A table of predictions from every model for each point of a parameter grid.
+# The runners sample x, y, and z from a small discrete space (32 x 8 x 16 is
+# 4096 points), so instead of running a model for every request we predict
+# the whole grid in one (vectorized) pass, and look points up in the table.
+# Learns go through the django_river_ml api, so a table knows it is stale
+# when the learn count of the model (in its stats) moves past the count it was
+# built with. It is rebuilt lazily, the next time it is asked for.
+
+import itertools
+import threading
+import time
+
+from django.conf import settings
+import pandas
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def validate_space(space):
+    """
+    Check a declared space is {feature: [values]}, and not too large to table.
+    """
+    if not isinstance(space, dict) or not space:
+        raise ValueError("The space must be a dictionary of feature values")
+    size = 1
+    for name, values in space.items():
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"The space for {name} must be a list of values")
+        if not all(isinstance(value, (int, float, str)) for value in values):
+            raise ValueError(f"The values for {name} must be numbers or strings")
+        size *= len(values)
+    limit = get_setting("LAMMPS_GRID_MAX_POINTS", 100000)
+    if size > limit:
+        raise ValueError(f"The space has {size} points, and the limit is {limit}")
+    return space
+
+
+class Grid:
+    """
+    Every combination of the values of a space, in a fixed (row major) order.
+
+    Features are sorted by name, and the last changes fastest. Finding the
+    position of a point is a dictionary lookup for each feature.
+    """
+
+    def __init__(self, space):
+        self.space = {name: list(space[name]) for name in sorted(space)}
+        self.offsets = [
+            {value: i for i, value in enumerate(values)}
+            for values in self.space.values()
+        ]
+        self.size = 1
+        for values in self.space.values():
+            self.size *= len(values)
+
+    def points(self):
+        names = list(self.space)
+        for values in itertools.product(*self.space.values()):
+            yield dict(zip(names, values))
+
+    def position(self, x):
+        """
+        Index of x in the table, or None if it is not a point of the grid.
+        """
+        if len(x) != len(self.space):
+            return None
+        position = 0
+        for name, offsets in zip(self.space, self.offsets):
+            offset = offsets.get(x.get(name))
+            if offset is None:
+                return None
+            position = position * len(offsets) + offset
+        return position
+
+
+def predict_grid(model, grid):
+    """
+    Predict every point of the grid with a model, in one pass if we can.
+
+    Pipelines and most linear models take a batch with predict_many. Others
+    (e.g., PARegressor) only predict one at a time, and if predict_many fails
+    for any reason we also predict one at a time. We raise ValueError if the
+    model cannot predict the grid at all.
+    """
+    points = list(grid.points())
+    try:
+        return [float(y) for y in model.predict_many(pandas.DataFrame(points))]
+    except Exception:
+        pass
+    try:
+        return [model.predict_one(x) for x in points]
+    except Exception as e:
+        raise ValueError(f"The model cannot predict the grid: {e!r}")
+
+
+class GridTables:
+    """
+    Prediction tables for each model, rebuilt lazily after learns.
+
+    A table can be up to LAMMPS_GRID_MAX_STALE_LEARNS learns behind its model
+    (the default is none), and never older than LAMMPS_GRID_MAX_STALE_SECONDS
+    when it is behind at all. The space is kept in the database, so every
+    worker uses the same one, and the tables are kept in memory.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.declared = None
+        self.grid = None
+        self.tables = {}
+
+    def get_grid(self, client):
+        """
+        The declared space (or the default from settings) as a grid.
+        """
+        space = client.db.get("grid/space") or get_setting("LAMMPS_GRID", None)
+        if not space:
+            return None
+        if space != self.declared:
+            self.declared = space
+            self.grid = Grid(space)
+            self.tables = {}
+        return self.grid
+
+    def declare(self, client, space):
+        """
+        Use a new space, and drop the tables for the old one.
+        """
+        client.db["grid/space"] = validate_space(space)
+        with self.lock:
+            return self.get_grid(client)
+
+    def get_learns(self, client, model_name):
+        stats = client.db.get(f"stats/{model_name}")
+        return int(stats["learn_mean"].n) if stats else 0
+
+    def is_stale(self, table, learns):
+        behind = learns - table["learns"]
+        if behind <= 0:
+            return False
+        if behind > get_setting("LAMMPS_GRID_MAX_STALE_LEARNS", 0):
+            return True
+        age = time.time() - table["built"]
+        return age > get_setting("LAMMPS_GRID_MAX_STALE_SECONDS", 60)
+
+    def get(self, client, model_name):
+        """
+        The table for a model (rebuilt if it is too stale), or None.
+
+        We raise ValueError if the model cannot predict the grid.
+        """
+        with self.lock:
+            grid = self.get_grid(client)
+            if grid is None:
+                return None
+            learns = self.get_learns(client, model_name)
+            table = self.tables.get(model_name)
+            if table is not None and not self.is_stale(table, learns):
+                return {**table, "learns_behind": learns - table["learns"]}
+
+            model = client.get_model(model_name)
+            if model is None:
+                self.tables.pop(model_name, None)
+                return None
+            start = time.perf_counter()
+            table = {
+                "grid": grid,
+                "learns": learns,
+                "built": time.time(),
+                "predictions": predict_grid(model, grid),
+                "duration": time.perf_counter() - start,
+            }
+            self.tables[model_name] = table
+            return {**table, "learns_behind": 0}
+
+    def drop(self, model_name):
+        """
+        Drop the table of a model that changed without a learn (e.g., rebuilt).
+        """
+        with self.lock:
+            self.tables.pop(model_name, None)
+
+    def lookup(self, client, model_name, x):
+        """
+        Prediction for x from the table, or None if x is not on the grid.
+
+        This is also None if the model cannot predict the grid, so the caller
+        predicts x with the model.
+        """
+        with self.lock:
+            grid = self.get_grid(client)
+        if grid is None or grid.position(x) is None:
+            return None
+        try:
+            table = self.get(client, model_name)
+        except ValueError:
+            return None
+        if table is None:
+            return None
+        return table["predictions"][table["grid"].position(x)]
+
+
+tables = GridTables()
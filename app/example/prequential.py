@@ -0,0 +1,106 @@
+# Prequential (test then train) evaluation: each model predicts a sample
+# before it learns from it, so every sample is an honest test of the model
+# as it was. We keep the last few (truth, prediction) pairs of each model for
+# rolling MAE, RMSE, and R squared, and a bounded history of them over the
+# samples, so a train campaign also gives a live accuracy curve. The cumulative
+# metrics and learn stats django_river_ml keeps are updated as for a learn.
+
+import math
+import time
+
+from django.conf import settings
+from django_river_ml import storage
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def new_record():
+    return {"n": 0, "pairs": [], "history": []}
+
+
+def get_record(client, name):
+    return client.db.get(f"prequential/{name}") or new_record()
+
+
+def score(pairs):
+    """
+    MAE, RMSE, and R squared of (truth, prediction) pairs.
+
+    R squared is None when the truth does not vary in the window.
+    """
+    if not pairs:
+        return {"mae": None, "rmse": None, "r2": None}
+    errors = [truth - pred for truth, pred in pairs]
+    mean = sum(truth for truth, _ in pairs) / len(pairs)
+    total = sum((truth - mean) ** 2 for truth, _ in pairs)
+    residual = sum(error**2 for error in errors)
+    return {
+        "mae": sum(abs(error) for error in errors) / len(errors),
+        "rmse": math.sqrt(residual / len(errors)),
+        "r2": 1 - residual / total if total > 0 else None,
+    }
+
+
+def update_record(record, truth, prediction, window=50, keep=1000):
+    """
+    Add a pair to the window, and the rolling metrics to the history.
+
+    A model that cannot predict a number yet is not scored. We return the
+    rolling metrics (with the count of samples scored).
+    """
+    if isinstance(prediction, (int, float)) and math.isfinite(prediction):
+        record["n"] += 1
+        record["pairs"] = (record["pairs"] + [[truth, float(prediction)]])[-window:]
+        record["history"] = (
+            record["history"] + [{"n": record["n"], **score(record["pairs"])}]
+        )[-keep:]
+    return {"n": record["n"], **score(record["pairs"])}
+
+
+def get_options():
+    """
+    The window and history we keep, from the settings.
+    """
+    return {
+        "window": get_setting("LAMMPS_PREQUENTIAL_WINDOW", 50),
+        "keep": get_setting("LAMMPS_PREQUENTIAL_HISTORY", 1000),
+    }
+
+
+def update_stats(client, name, duration):
+    """
+    Count the learn in the stats of the model, as the timer middleware would.
+
+    The prediction tables know a model changed by its learn count.
+    """
+    if f"stats/{name}" not in client.db:
+        storage.init_stats(name)
+    stats = client.db[f"stats/{name}"]
+    stats["learn_mean"].update(duration)
+    stats["learn_ewm"].update(duration)
+    client.db[f"stats/{name}"] = stats
+
+
+def score_and_learn(client, name, x, y):
+    """
+    Predict x with a model, score the prediction against y, then learn (x, y).
+
+    We return the prediction and rolling metrics, or raise ValueError.
+    """
+    started_at = time.perf_counter_ns()
+    success, prediction = client.make_prediction(x, name)
+    if not success:
+        raise ValueError(prediction)
+    success, message = client.finish_learn(
+        "learn", prediction=prediction, features=x, ground_truth=y, model_name=name
+    )
+    if not success:
+        raise ValueError(message)
+    update_stats(client, name, time.perf_counter_ns() - started_at)
+
+    record = get_record(client, name)
+    current = update_record(record, y, prediction, **get_options())
+    client.db[f"prequential/{name}"] = record
+    return prediction, current
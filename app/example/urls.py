@@ -4,4 +4,16 @@ import app.example.views as views
 urlpatterns = [
     path("", views.index),
     path("data/model/clusters/<str:name>/", views.get_centroids, name="model_clusters"),
+    path("data/model/export/<str:name>/", views.get_export, name="model_export"),
+    path("data/predict/", views.predict_all, name="predict_all"),
+    path("data/grid/", views.predict_grid, name="predict_grid"),
+    path("data/learn/", views.score_and_learn, name="score_and_learn"),
+    path("data/prequential/", views.get_prequential, name="prequential"),
+    path("data/races/", views.get_races, name="races"),
+    path("data/events/", views.learn_events, name="learn_events"),
+    path("data/versions/<str:name>/", views.model_as_of, name="model_as_of"),
+    path("data/models/summary/", views.models_summary, name="models_summary"),
+    path("data/uncertainty/", views.predict_uncertainty, name="predict_uncertainty"),
+    path("data/quantiles/", views.predict_quantiles, name="predict_quantiles"),
+    path("data/scaling/", views.predict_scaling, name="predict_scaling"),
 ]
@@ -0,0 +1,219 @@
+# Versions of the linear models over the samples they learned, to see how the
+# weights (and predictions) changed as they were trained. Every few learn
+# events we keep the export of each linear model (weights, intercept, and the
+# scaler means and variances), but only the values that changed since the
+# last version, and a full (base) version every few versions. We keep every
+# version for the most recent, and only the bases for the rest, so storage
+# grows slowly. The versions are in the database of the learn event log.
+
+import json
+import threading
+import time
+
+from app.example.events import events
+from app.example.export import export_model
+from app.example.grid import get_setting
+
+schema = """
+CREATE TABLE IF NOT EXISTS versions (
+    model TEXT NOT NULL,
+    event INTEGER NOT NULL,
+    base INTEGER NOT NULL,
+    created REAL NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (model, event)
+);
+"""
+
+# Values by feature, and the values of the whole model
+keys = ["weights", "means", "vars"]
+scalars = ["kind", "intercept", "version"]
+
+
+def to_state(exported):
+    """
+    An export with values by feature, so we can tell what changed.
+    """
+    state = {name: exported[name] for name in scalars}
+    for key in keys:
+        values = exported[key]
+        state[key] = None if values is None else dict(zip(exported["features"], values))
+    return state
+
+
+def to_export(state):
+    """
+    A state as an export (values in the order of the features), to predict.
+    """
+    features = sorted(set(state["weights"]) | set(state["means"] or {}))
+    exported = {name: state[name] for name in scalars}
+    exported["features"] = features
+    for key in keys:
+        values = state[key]
+        exported[key] = (
+            None if values is None else [values.get(name, 0.0) for name in features]
+        )
+    return exported
+
+
+def get_delta(previous, state):
+    delta = {name: state[name] for name in scalars}
+    for key in keys:
+        values, before = state[key], previous[key] or {}
+        delta[key] = (
+            None
+            if values is None
+            else {name: v for name, v in values.items() if before.get(name) != v}
+        )
+    return delta
+
+
+def apply_delta(state, delta):
+    updated = {**state, **{name: delta[name] for name in scalars}}
+    for key in keys:
+        values = delta[key]
+        updated[key] = None if values is None else {**(state[key] or {}), **values}
+    return updated
+
+
+class VersionLog:
+    """
+    Versions of each model, as deltas from the last, by learn event.
+
+    We remember the last version of each model, to take the next delta from.
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.latest = {}
+
+    def connect(self):
+        conn = self.log.connect()
+        if not getattr(self.local, "ready", False):
+            conn.executescript(schema)
+            self.local.ready = True
+        return conn
+
+    def is_due(self, event):
+        return event % get_setting("LAMMPS_VERSION_EVERY", 10) == 0
+
+    def get_latest(self, name):
+        """
+        The last version of a model, as (event, versions since base, state).
+        """
+        if name not in self.latest:
+            conn = self.connect()
+            row = conn.execute(
+                "SELECT MAX(event) FROM versions WHERE model = ? AND base = 1", (name,)
+            ).fetchone()
+            since = conn.execute(
+                "SELECT COUNT(*) FROM versions WHERE model = ? AND event > ?",
+                (name, row[0] or 0),
+            ).fetchone()[0]
+            event, state = self.get(name)
+            self.latest[name] = (event, since, state) if state else None
+        return self.latest[name]
+
+    def record(self, name, event, model):
+        """
+        Keep a version of a model after it learned the events up to event.
+
+        We return False if we cannot export the model, or it did not change.
+        """
+        exported = export_model(model)
+        if exported is None:
+            return False
+        state = to_state(exported)
+        with self.lock:
+            latest = self.get_latest(name)
+            if latest is not None and latest[2]["version"] == state["version"]:
+                return False
+            base = latest is None or latest[1] + 1 >= get_setting(
+                "LAMMPS_VERSION_BASE_EVERY", 20
+            )
+            data = state if base else get_delta(latest[2], state)
+            conn = self.connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO versions VALUES (?, ?, ?, ?, ?)",
+                    (name, event, int(base), time.time(), json.dumps(data)),
+                )
+            self.latest[name] = (event, 0 if base else latest[1] + 1, state)
+            if base:
+                self.prune(name)
+        return True
+
+    def get(self, name, until=None):
+        """
+        The version of a model as of an event (or the last), as (event, state).
+
+        This is (None, None) if there is no version that old.
+        """
+        conn = self.connect()
+        query = "SELECT event, data FROM versions WHERE model = ? AND base = 1"
+        params = [name]
+        if until is not None:
+            query += " AND event <= ?"
+            params.append(until)
+        row = conn.execute(query + " ORDER BY event DESC LIMIT 1", params).fetchone()
+        if row is None:
+            return None, None
+        event, state = row[0], json.loads(row[1])
+        query = "SELECT event, data FROM versions WHERE model = ? AND event > ?"
+        params = [name, event]
+        if until is not None:
+            query += " AND event <= ?"
+            params.append(until)
+        for event, data in conn.execute(query + " ORDER BY event", params):
+            state = apply_delta(state, json.loads(data))
+        return event, state
+
+    def list(self, name):
+        return [
+            {"event": event, "base": bool(base)}
+            for event, base in self.connect().execute(
+                "SELECT event, base FROM versions WHERE model = ? ORDER BY event",
+                (name,),
+            )
+        ]
+
+    def prune(self, name):
+        """
+        Keep every version for the most recent, and only bases before them.
+
+        Deltas go back to a base, so we keep those after the last base before
+        the most recent LAMMPS_VERSIONS_RECENT versions. We keep at most
+        LAMMPS_VERSIONS_MAX_BASES bases.
+        """
+        conn = self.connect()
+        recent = conn.execute(
+            "SELECT event FROM versions WHERE model = ? "
+            "ORDER BY event DESC LIMIT 1 OFFSET ?",
+            (name, get_setting("LAMMPS_VERSIONS_RECENT", 200) - 1),
+        ).fetchone()
+        oldest = conn.execute(
+            "SELECT event FROM versions WHERE model = ? AND base = 1 "
+            "ORDER BY event DESC LIMIT 1 OFFSET ?",
+            (name, get_setting("LAMMPS_VERSIONS_MAX_BASES", 500) - 1),
+        ).fetchone()
+        with conn:
+            if recent is not None:
+                cutoff = conn.execute(
+                    "SELECT MAX(event) FROM versions "
+                    "WHERE model = ? AND base = 1 AND event <= ?",
+                    (name, recent[0]),
+                ).fetchone()[0]
+                conn.execute(
+                    "DELETE FROM versions WHERE model = ? AND base = 0 AND event < ?",
+                    (name, cutoff or 0),
+                )
+            if oldest is not None:
+                conn.execute(
+                    "DELETE FROM versions WHERE model = ? AND event < ?",
+                    (name, oldest[0]),
+                )
+
+
+versions = VersionLog(events)
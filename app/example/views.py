@@ -1,9 +1,29 @@
+import json
+import math
+import statistics
+import time
+
+from django.conf import settings
 from django.shortcuts import render
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django_river_ml import storage
 from django_river_ml.client import DjangoClient
-from django.http import JsonResponse
+from django.http import HttpResponseNotModified, JsonResponse
 import pandas
 from scipy.spatial.distance import pdist, squareform
 import sklearn.manifold as manifold
+from river import optim
+
+from lammps_stream_ml.local import LocalModel
+from lammps_stream_ml.models import get_kinds
+
+from app.example.export import export_model
+from app.example.grid import tables
+from app.example import prequential
+from app.example.events import events
+from app.example.versions import to_export, versions
+from app.example.workers import pool
 
 
 def get_centers(model):
@@ -48,6 +68,626 @@ def get_centroids(request, name):
     return JsonResponse({"centers": generate_embeddings(centers)})
 
 
+@csrf_exempt
+@require_POST
+def predict_all(request):
+    """
+    Predict one sample with every model (or a named subset) in one request.
+
+    The body is {"x": {...}, "models": [...]} and models is optional. We also
+    return how long the predictions took, so a client can tell server time
+    apart from time on the network. A point on the grid is looked up in the
+    prediction table of each model, and we say which models we looked up.
+    With model workers the tables are built from the last save, so every
+    point goes to the workers instead.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Request body must be json"}, status=400)
+    x = payload.get("x")
+    if not isinstance(x, dict):
+        return JsonResponse(
+            {"error": "A dictionary of features x is required"}, status=400
+        )
+
+    client = DjangoClient()
+    start = time.perf_counter()
+    predictions = {}
+    from_grid = []
+    remaining = []
+    for model_name in payload.get("models") or client.models():
+        pred = None
+        if not settings.LAMMPS_MODEL_WORKERS:
+            pred = tables.lookup(client, model_name, x)
+        if pred is not None:
+            predictions[model_name] = pred
+            from_grid.append(model_name)
+        else:
+            remaining.append(model_name)
+
+    # Model workers have the models in memory, and predict in parallel
+    if settings.LAMMPS_MODEL_WORKERS:
+        predictions.update(pool.predict(client, remaining, x)[0])
+        remaining = []
+    for model_name in remaining:
+        model = client.get_model(model_name)
+        if model is not None:
+            predictions[model_name] = model.predict_one(x)
+    return JsonResponse(
+        {
+            "predictions": predictions,
+            "duration": time.perf_counter() - start,
+            "from_grid": from_grid,
+        }
+    )
+
+
+@csrf_exempt
+def predict_grid(request):
+    """
+    Predictions from every model (or those named) for every point of the grid.
+
+    GET returns {"space": {...}, "models": {name: {"predictions": [...]}}}
+    where features are sorted by name and predictions are in row major order
+    (the last feature changes fastest). Models can be named with ?model=.
+    A model that cannot predict the grid is left out, with its error under
+    "errors". POST {"space": {feature: [values]}} declares the grid, and
+    returns it.
+    """
+    client = DjangoClient()
+    if request.method == "POST":
+        try:
+            payload = json.loads(request.body)
+            grid = tables.declare(client, payload.get("space"))
+        except (ValueError, AttributeError) as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return JsonResponse({"space": grid.space, "size": grid.size})
+
+    if request.method != "GET":
+        return JsonResponse({"error": "Use GET or POST"}, status=405)
+    grid = None
+    result = {}
+    errors = {}
+    for model_name in request.GET.getlist("model") or client.models():
+        try:
+            table = tables.get(client, model_name)
+        except ValueError as e:
+            errors[model_name] = str(e)
+            continue
+        if table is None:
+            continue
+        grid = table["grid"]
+        result[model_name] = {
+            "learns": table["learns"],
+            "learns_behind": table["learns_behind"],
+            "built": table["built"],
+            "predictions": table["predictions"],
+        }
+    if grid is None:
+        return JsonResponse(
+            {"error": "There is no grid or no model", "errors": errors}, status=404
+        )
+    return JsonResponse(
+        {"space": grid.space, "size": grid.size, "models": result, "errors": errors}
+    )
+
+
+@csrf_exempt
+@require_POST
+def score_and_learn(request):
+    """
+    Test then train every model (or those named) on one sample.
+
+    The body is {"x": {...}, "y": value, "models": [...]} and models is
+    optional. Each model predicts x before it learns (x, y), and we return
+    the predictions with the rolling MAE, RMSE, and R squared of each model.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Request body must be json"}, status=400)
+    x = payload.get("x")
+    y = payload.get("y")
+    if not isinstance(x, dict) or not isinstance(y, (int, float)):
+        return JsonResponse(
+            {"error": "A dictionary of features x and a number y are required"},
+            status=400,
+        )
+
+    client = DjangoClient()
+    start = time.perf_counter()
+    names = payload.get("models") or client.models()
+
+    # The sample is logged before the models learn it
+    event = None
+    if events.is_enabled():
+        event = events.append(x, y, payload.get("models"))
+    snapshot = event is not None and events.is_due(event)
+    version = event is not None and versions.is_due(event)
+
+    def keep(model_name, model):
+        if snapshot:
+            events.snapshot(model_name, event, model)
+        if version:
+            versions.record(model_name, event, model)
+
+    predictions = {}
+    metrics = {}
+    errors = {}
+    if settings.LAMMPS_MODEL_WORKERS:
+        results, errors = pool.learn(
+            client, names, x, y, return_model=snapshot or version
+        )
+        for model_name, (prediction, current, model) in results.items():
+            predictions[model_name], metrics[model_name] = prediction, current
+            if model is not None:
+                keep(model_name, model)
+        names = []
+    for model_name in names:
+        try:
+            predictions[model_name], metrics[model_name] = (
+                prequential.score_and_learn(client, model_name, x, y)
+            )
+        except ValueError as e:
+            errors[model_name] = str(e)
+            continue
+        if snapshot or version:
+            keep(model_name, client.get_model(model_name))
+
+    # Every model gets a snapshot, even one that did not learn this sample, so
+    # no model holds back compaction
+    if snapshot:
+        others = [name for name in client.models() if name not in predictions]
+        if settings.LAMMPS_MODEL_WORKERS:
+            found = pool.get_models(client, others)[0]
+        else:
+            found = {name: client.get_model(name) for name in others}
+        for model_name, model in found.items():
+            if model is not None:
+                events.snapshot(model_name, event, model)
+    if event is not None and events.is_compaction_due(event):
+        events.compact(client.models())
+    return JsonResponse(
+        {
+            "predictions": predictions,
+            "metrics": metrics,
+            "errors": errors,
+            "event": event,
+            "duration": time.perf_counter() - start,
+        }
+    )
+
+
+@csrf_exempt
+def learn_events(request):
+    """
+    The learn event log: GET a summary, or POST to rebuild a model from it.
+
+    The body is {"model": name, "kind": kind, "batch_size": 1} and kind is
+    optional. Without it the model is rebuilt from its last snapshot and the
+    events after it. With it, a new model of that kind (from this repository,
+    e.g., after the code for it changed) learns every event in the log. The
+    rebuilt model replaces the model (or is created) on the server.
+    """
+    if not events.is_enabled():
+        return JsonResponse({"error": "There is no learn event log"}, status=404)
+    if request.method == "GET":
+        return JsonResponse(events.summary())
+    if request.method != "POST":
+        return JsonResponse({"error": "Use GET or POST"}, status=405)
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Request body must be json"}, status=400)
+    model_name = payload.get("model")
+    if not model_name:
+        return JsonResponse({"error": "The model to rebuild is required"}, status=400)
+
+    model = None
+    kind = payload.get("kind")
+    if kind:
+        choices = get_kinds()
+        if kind not in choices:
+            return JsonResponse(
+                {"error": f"{kind} is not a known kind of model"}, status=400
+            )
+        model = choices[kind]
+
+    client = DjangoClient()
+    start = time.perf_counter()
+    try:
+        model, after, count, last = events.rebuild(
+            model_name, model, batch_size=payload.get("batch_size", 1)
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=404)
+    if last:
+        events.snapshot(model_name, last, model)
+
+    # A worker (and the prediction table) has the model from before
+    if settings.LAMMPS_MODEL_WORKERS:
+        pool.discard(model_name)
+    if model_name in client.models():
+        client.save_model(model, model_name)
+    else:
+        storage.add_model(model, "regression", name=model_name)
+    tables.drop(model_name)
+    return JsonResponse(
+        {
+            "model": model_name,
+            "kind": kind,
+            "snapshot": after or None,
+            "events": count,
+            "duration": time.perf_counter() - start,
+        }
+    )
+
+
+@csrf_exempt
+def model_as_of(request, name):
+    """
+    A model as of a learn event (sample) n, from its versions or the log.
+
+    GET ?n= returns the weights of the last version of a linear model as of
+    n (in the format of an export), or without n, the versions we have. POST
+    {"n": n, "points": [...]} predicts the points with the model as it was
+    after event n. We rebuild it from the snapshot before n and the events up
+    to n if we can (replay), and use the version of a linear model if not
+    (weights, which can be a few events before n).
+    """
+    if not events.is_enabled():
+        return JsonResponse({"error": "There is no learn event log"}, status=404)
+    if request.method == "GET":
+        if "n" not in request.GET:
+            return JsonResponse({"model": name, "versions": versions.list(name)})
+        try:
+            n = int(request.GET["n"])
+        except ValueError:
+            return JsonResponse({"error": "n must be an event number"}, status=400)
+        event, state = versions.get(name, n)
+        if state is None:
+            return JsonResponse(
+                {"error": f"There is no version of {name} as of {n}"}, status=404
+            )
+        return JsonResponse({"model": name, "n": n, "event": event, **to_export(state)})
+    if request.method != "POST":
+        return JsonResponse({"error": "Use GET or POST"}, status=405)
+
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Request body must be json"}, status=400)
+    n = payload.get("n")
+    points = payload.get("points")
+    if not isinstance(n, int) or not isinstance(points, list):
+        return JsonResponse(
+            {"error": "An event number n and a list of points are required"},
+            status=400,
+        )
+    try:
+        model, _, _, event = events.rebuild(name, until=n)
+        return JsonResponse(
+            {
+                "model": name,
+                "n": n,
+                "event": event,
+                "method": "replay",
+                "predictions": [model.predict_one(x) for x in points],
+            }
+        )
+    except ValueError as e:
+        reason = str(e)
+    event, state = versions.get(name, n)
+    if state is None:
+        return JsonResponse({"error": reason}, status=404)
+    local = LocalModel(to_export(state))
+    return JsonResponse(
+        {
+            "model": name,
+            "n": n,
+            "event": event,
+            "method": "weights",
+            "predictions": local.predict_many(points).tolist(),
+        }
+    )
+
+
+def get_prequential(request):
+    """
+    Rolling metrics of every model (or those named with ?model=) over samples.
+
+    For each model we return the window and a history of the rolling metrics
+    after each sample it was scored on, the most recent last.
+    """
+    client = DjangoClient()
+    window = prequential.get_setting("LAMMPS_PREQUENTIAL_WINDOW", 50)
+    result = {}
+    for model_name in request.GET.getlist("model") or client.models():
+        record = prequential.get_record(client, model_name)
+        result[model_name] = {
+            "n": record["n"],
+            "metrics": record["history"][-1] if record["history"] else None,
+            "history": record["history"],
+        }
+    return JsonResponse({"window": window, "models": result})
+
+
+def get_races(request):
+    """
+    The leaderboard of every model that races variants (or those named).
+
+    For each we return the leader, the variants still in the race with their
+    mean error in this rung, and the variants each rung kept.
+    """
+    client = DjangoClient()
+    races = {}
+    for model_name in request.GET.getlist("model") or client.models():
+        model = client.get_model(model_name)
+        if hasattr(model, "leaderboard"):
+            races[model_name] = model.leaderboard()
+    return JsonResponse({"races": races})
+
+
+def get_export(request, name):
+    """
+    Scaler statistics and weights of a linear model, to predict on the client.
+
+    The ETag is the version of the export, so a client that sends it back in
+    If-None-Match gets 304 Not Modified until the model changes.
+    """
+    model = DjangoClient().get_model(name)
+    if model is None:
+        return JsonResponse({"error": f"There is no model {name}"}, status=404)
+    exported = export_model(model)
+    if exported is None:
+        return JsonResponse(
+            {"error": f"Model {name} is not a linear model we can export"},
+            status=404,
+        )
+    etag = f'"{exported["version"]}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse({"model": name, **exported})
+    response["ETag"] = etag
+    return response
+
+
+def get_quantile(model):
+    """
+    The quantile a model predicts, if it learns with the quantile (pinball) loss.
+
+    The regressor can be wrapped to transform the target, or the last step of
+    a pipeline.
+    """
+    model = getattr(model, "regressor", model)
+    if hasattr(model, "steps"):
+        model = list(model.steps.values())[-1]
+    loss = getattr(model, "loss", None)
+    if isinstance(loss, optim.losses.Quantile):
+        return loss.alpha
+
+
+@csrf_exempt
+@require_POST
+def predict_quantiles(request):
+    """
+    Predict quantiles (e.g., p50, p90, p99) of the target for each point.
+
+    The body is {"points": [{...}, ...]} and we return, for each point, the
+    prediction of every model that learns a quantile, by quantile. Models are
+    trained on their own, so their predictions can cross, and we sort them to
+    keep a higher quantile from being lower.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Request body must be json"}, status=400)
+    points = payload.get("points")
+    if not isinstance(points, list):
+        return JsonResponse({"error": "A list of points is required"}, status=400)
+
+    client = DjangoClient()
+    models = {}
+    for model_name in client.models():
+        model = client.get_model(model_name)
+        quantile = get_quantile(model) if model is not None else None
+        if quantile is not None and quantile not in models:
+            models[quantile] = (model_name, model)
+    if not models:
+        return JsonResponse(
+            {"error": "There is no model that predicts a quantile"}, status=404
+        )
+
+    ordered = sorted(models)
+    results = []
+    for x in points:
+        predictions = []
+        for quantile in ordered:
+            model_name, model = models[quantile]
+            pred = tables.lookup(client, model_name, x)
+            predictions.append(model.predict_one(x) if pred is None else pred)
+        results.append(dict(zip(map(str, ordered), sorted(predictions))))
+    return JsonResponse(
+        {
+            "quantiles": results,
+            "models": {str(q): model_name for q, (model_name, _) in models.items()},
+        }
+    )
+
+
+def predict_median(client, x, names):
+    """
+    Median prediction of the models for x (looked up in the grid if we can).
+    """
+    predictions = []
+    for model_name in names:
+        pred = tables.lookup(client, model_name, x)
+        if pred is None:
+            model = client.get_model(model_name)
+            pred = model.predict_one(x) if model is not None else None
+        if pred is not None:
+            predictions.append(pred)
+    return statistics.median(predictions) if predictions else None
+
+
+@csrf_exempt
+@require_POST
+def predict_scaling(request):
+    """
+    Predicted time to solution of a run over numbers of nodes.
+
+    The body is {"x": {...}, "nodes": [1, 2, 4], "ranks_per_node": 4} and
+    optionally a "model" (we use the median of the models that predict the
+    run time), "log_target" if they learn log(1 + time), and "min_efficiency"
+    (0.7). For each number of nodes we return the time, node seconds, and the
+    parallel efficiency relative to the fewest nodes. We also say which is
+    fastest, cheapest (fewest node seconds), and the fastest that is at least
+    min_efficiency. Models need nodes and ranks as features to tell them apart.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Request body must be json"}, status=400)
+    x = payload.get("x")
+    nodes = payload.get("nodes")
+    if not isinstance(x, dict) or not isinstance(nodes, list) or not nodes:
+        return JsonResponse(
+            {"error": "A dictionary of features x and a list of nodes are required"},
+            status=400,
+        )
+    ranks_per_node = payload.get("ranks_per_node", 1)
+    min_efficiency = payload.get("min_efficiency", 0.7)
+
+    client = DjangoClient()
+    if payload.get("model"):
+        names = [payload["model"]]
+    else:
+        names = [
+            name
+            for name in client.models()
+            if get_quantile(client.get_model(name)) is None
+        ]
+
+    curve = []
+    for count in sorted(nodes):
+        features = {**x, "nodes": count, "ranks": count * ranks_per_node}
+        time_to_solution = predict_median(client, features, names)
+        if time_to_solution is None:
+            return JsonResponse({"error": "There is no model to predict"}, status=404)
+        if payload.get("log_target"):
+            time_to_solution = math.expm1(time_to_solution)
+        curve.append(
+            {
+                "nodes": count,
+                "ranks": features["ranks"],
+                "time": time_to_solution,
+                "node_seconds": time_to_solution * count,
+            }
+        )
+    for point in curve:
+        point["efficiency"] = (
+            curve[0]["node_seconds"] / point["node_seconds"]
+            if point["node_seconds"] > 0
+            else None
+        )
+    efficient = [
+        point for point in curve if (point["efficiency"] or 0) >= min_efficiency
+    ]
+    return JsonResponse(
+        {
+            "curve": curve,
+            "fastest": min(curve, key=lambda point: point["time"])["nodes"],
+            "cheapest": min(curve, key=lambda point: point["node_seconds"])["nodes"],
+            "efficient": (
+                min(efficient, key=lambda point: point["time"])["nodes"]
+                if efficient
+                else None
+            ),
+        }
+    )
+
+
+def get_sigmas(model, candidates):
+    """
+    Predictive standard deviation for each candidate, if the model has one.
+
+    Models like BayesianLinearRegression can return a distribution (and a
+    pipeline passes the argument on to its last step). Others raise TypeError.
+    """
+    try:
+        return [model.predict_one(x, with_dist=True).sigma for x in candidates]
+    except (TypeError, AttributeError):
+        return None
+
+
+@csrf_exempt
+@require_POST
+def predict_uncertainty(request):
+    """
+    Score candidate samples by how uncertain a model is about them.
+
+    The body is {"candidates": [{...}, ...], "model": name} and the model is
+    optional - we use the first that predicts a distribution.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Request body must be json"}, status=400)
+    candidates = payload.get("candidates")
+    if not isinstance(candidates, list):
+        return JsonResponse({"error": "A list of candidates is required"}, status=400)
+
+    client = DjangoClient()
+    names = [payload["model"]] if payload.get("model") else client.models()
+    for model_name in names:
+        model = client.get_model(model_name)
+        sigmas = get_sigmas(model, candidates) if model is not None else None
+        if sigmas is not None:
+            return JsonResponse({"model": model_name, "sigma": sigmas})
+    return JsonResponse(
+        {"error": "There is no model that predicts a distribution"}, status=404
+    )
+
+
+def get_params(value):
+    """
+    Make the (nested) parameters of a river model json serializable.
+
+    Nested estimators are given as (class, params), and we show them as
+    [name, params]. Anything else we don't know how to serialize is a string.
+    """
+    if isinstance(value, dict):
+        return {str(key): get_params(item) for key, item in value.items()}
+    if isinstance(value, tuple) and len(value) == 2 and isinstance(value[0], type):
+        return [value[0].__name__, get_params(value[1])]
+    if isinstance(value, (list, tuple)):
+        return [get_params(item) for item in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def models_summary(request):
+    """
+    Stats, metrics and parameters for every model, in one response.
+
+    This is what a client would otherwise ask for with three requests per model
+    at the end of a campaign.
+    """
+    client = DjangoClient()
+    summary = {}
+    for model_name in client.models():
+        model = client.get_model(model_name)
+        summary[model_name] = {
+            "stats": client.stats(model_name),
+            "metrics": client.metrics(model_name),
+            "model": get_params(model._get_params()) if model is not None else None,
+        }
+    return JsonResponse({"models": summary})
+
+
 def index(request):
     # Get a django client
     client = DjangoClient()
@@ -0,0 +1,256 @@
+# Model workers: each model is owned by a long lived process that keeps it
+# (with its metrics, learn stats, and prequential window) in memory, and
+# learns or predicts for the messages it gets, in order. A learn for every
+# model sends to all the workers before we wait for any, so models learn in
+# parallel, and a model is not loaded and saved for each learn. Every few
+# learns a worker sends its state with the reply, and we save it, so the
+# database is only a checkpoint, up to that many learns behind. Predictions
+# for /data/predict/ come from the workers, not the prediction tables (which
+# are built from, and count learns in, the database). Everything else that
+# reads the models from the database (e.g., /data/grid/, quantiles, and the
+# django_river_ml api) is as of the last save. Learns should then go through
+# /data/learn/, and there should be one server process.
+
+import atexit
+import multiprocessing
+import threading
+import time
+
+from django_river_ml import storage
+from django_river_ml.client import DjangoClient
+
+from app.example import prequential
+
+
+def serve(conn, state, options):
+    """
+    Learn and predict for the messages from conn until we are stopped.
+
+    Each reply is ("ok", ...) or ("error", message). A learn is scored before
+    the model learns from it, and we send the state back with the reply after
+    every save_every learns (or if the learn asks for the model).
+    """
+    model = state["model"]
+    unsaved = 0
+
+    def get_state():
+        return {key: state[key] for key in ["model", "metrics", "stats", "prequential"]}
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        kind = message[0]
+        if kind == "stop":
+            conn.send(("ok", get_state()))
+            return
+        if kind == "state":
+            unsaved = 0
+            conn.send(("ok", get_state()))
+            continue
+        try:
+            if kind == "predict":
+                conn.send(("ok", model.predict_one(message[1])))
+                continue
+
+            _, x, y, return_model = message
+            started_at = time.perf_counter_ns()
+            prediction = model.predict_one(x)
+            if prediction:
+                for metric in state["metrics"]:
+                    try:
+                        metric.update(y_true=y, y_pred=prediction)
+                    except Exception:
+                        pass
+            model.learn_one(x, y)
+            duration = time.perf_counter_ns() - started_at
+            state["stats"]["learn_mean"].update(duration)
+            state["stats"]["learn_ewm"].update(duration)
+            current = prequential.update_record(
+                state["prequential"], y, prediction, **options["prequential"]
+            )
+            unsaved += 1
+            saved = None
+            if unsaved >= options["save_every"] or return_model:
+                saved = get_state()
+                unsaved = 0
+            conn.send(("ok", (prediction, current, saved)))
+        except Exception as e:
+            conn.send(("error", repr(e)))
+
+
+class ModelWorker:
+    """
+    The process that owns a model, and the end of the pipe we talk to it on.
+
+    One request at a time can hold the lock, so messages and replies to a
+    worker are never interleaved.
+    """
+
+    def __init__(self, context, name, state, options):
+        self.name = name
+        self.lock = threading.Lock()
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=serve, args=(child, state, options), daemon=True
+        )
+        self.process.start()
+        child.close()
+
+    def send(self, message):
+        self.conn.send(message)
+
+    def recv(self):
+        """
+        The reply to a message, or raise ValueError if the worker failed.
+        """
+        try:
+            status, value = self.conn.recv()
+        except (EOFError, OSError):
+            raise ValueError(f"The worker for {self.name} stopped")
+        if status != "ok":
+            raise ValueError(value)
+        return value
+
+
+class WorkerPool:
+    """
+    A worker for each model, started the first time the model is used.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.workers = {}
+        self.context = multiprocessing.get_context("spawn")
+        atexit.register(self.close)
+
+    def get_state(self, client, name):
+        if f"stats/{name}" not in client.db:
+            storage.init_stats(name)
+        return {
+            "model": client.get_model(name),
+            "metrics": client.db[f"metrics/{name}"],
+            "stats": client.db[f"stats/{name}"],
+            "prequential": prequential.get_record(client, name),
+        }
+
+    def save(self, client, name, state):
+        client.save_model(state["model"], name)
+        client.db[f"metrics/{name}"] = state["metrics"]
+        client.db[f"stats/{name}"] = state["stats"]
+        client.db[f"prequential/{name}"] = state["prequential"]
+
+    def get_workers(self, client, names):
+        """
+        Workers for the models (by name), starting any that are not running.
+
+        Workers for models the server no longer has are stopped. A model
+        that does not exist has no worker.
+        """
+        known = set(client.models())
+        options = {
+            "prequential": prequential.get_options(),
+            "save_every": prequential.get_setting(
+                "LAMMPS_MODEL_WORKERS_SAVE_EVERY", 10
+            ),
+        }
+        with self.lock:
+            for name in [name for name in self.workers if name not in known]:
+                self.workers.pop(name).process.terminate()
+            for name in names:
+                worker = self.workers.get(name)
+                if worker is not None and not worker.process.is_alive():
+                    worker = None
+                if worker is None and name in known:
+                    self.workers[name] = ModelWorker(
+                        self.context, name, self.get_state(client, name), options
+                    )
+            return {name: self.workers[name] for name in names if name in self.workers}
+
+    def call(self, client, names, message):
+        """
+        Send a message to the worker of each model, then wait for each reply.
+
+        We return the replies and errors, by model name.
+        """
+        workers = self.get_workers(client, names)
+        ordered = sorted(workers)
+        replies = {}
+        errors = {
+            name: f"No model named '{name}'." for name in names if name not in workers
+        }
+        for name in ordered:
+            workers[name].lock.acquire()
+        try:
+            sent = []
+            for name in ordered:
+                try:
+                    workers[name].send(message)
+                    sent.append(name)
+                except OSError:
+                    errors[name] = f"The worker for {name} stopped"
+            for name in sent:
+                try:
+                    replies[name] = workers[name].recv()
+                except ValueError as e:
+                    errors[name] = str(e)
+        finally:
+            for name in ordered:
+                workers[name].lock.release()
+        return replies, errors
+
+    def learn(self, client, names, x, y, return_model=False):
+        """
+        Test then train every model on (x, y), and save any state we get.
+
+        We can also return each model after it learned (e.g., to snapshot it).
+        """
+        replies, errors = self.call(client, names, ("learn", x, y, return_model))
+        results = {}
+        for name, (prediction, current, state) in replies.items():
+            if state is not None:
+                self.save(client, name, state)
+            model = state["model"] if return_model and state is not None else None
+            results[name] = (prediction, current, model)
+        return results, errors
+
+    def get_models(self, client, names):
+        """
+        The models as the workers have them now, which we also save.
+        """
+        replies, errors = self.call(client, names, ("state",))
+        for name, state in replies.items():
+            self.save(client, name, state)
+        return {name: state["model"] for name, state in replies.items()}, errors
+
+    def predict(self, client, names, x):
+        return self.call(client, names, ("predict", x))
+
+    def discard(self, name):
+        """
+        Stop the worker of a model without saving it (e.g., it was rebuilt).
+        """
+        with self.lock:
+            worker = self.workers.pop(name, None)
+        if worker is not None:
+            worker.process.terminate()
+
+    def close(self):
+        """
+        Save the state of every worker and stop it.
+        """
+        client = DjangoClient()
+        with self.lock:
+            for name, worker in self.workers.items():
+                try:
+                    with worker.lock:
+                        worker.send(("stop",))
+                        state = worker.recv()
+                except ValueError:
+                    continue
+                self.save(client, name, state)
+            self.workers = {}
+
+
+pool = WorkerPool()
@@ -20,6 +20,53 @@ DJANGO_RIVER_ML = {
     "JWT_SECRET_KEY": os.environ.get('JWT_SECRET_KEY') or 'pancakes',
 }
 
+# Prediction tables (app/example/grid.py) are for this space until a runner
+# declares another. This is the x, y, and z of the published experiments.
+LAMMPS_GRID = {
+    "x": list(range(1, 33)),
+    "y": list(range(1, 9)),
+    "z": list(range(1, 17)),
+}
+LAMMPS_GRID_MAX_POINTS = 100000
+
+# A table is rebuilt when it is more learns behind its model than this, or
+# when it is behind at all and older than the seconds.
+LAMMPS_GRID_MAX_STALE_LEARNS = int(os.environ.get("LAMMPS_GRID_MAX_STALE_LEARNS", 0))
+LAMMPS_GRID_MAX_STALE_SECONDS = int(os.environ.get("LAMMPS_GRID_MAX_STALE_SECONDS", 60))
+
+# Prequential metrics (app/example/prequential.py) are over the last samples
+# of the window, and we keep them for the most recent samples of the history.
+LAMMPS_PREQUENTIAL_WINDOW = int(os.environ.get("LAMMPS_PREQUENTIAL_WINDOW", 50))
+LAMMPS_PREQUENTIAL_HISTORY = int(os.environ.get("LAMMPS_PREQUENTIAL_HISTORY", 1000))
+
+# With model workers (app/example/workers.py) each model is kept in memory by
+# its own process, for /data/learn/ and /data/predict/, and saved after this
+# many learns. Use them with one server process.
+LAMMPS_MODEL_WORKERS = os.environ.get("LAMMPS_MODEL_WORKERS", "") in ["1", "true"]
+LAMMPS_MODEL_WORKERS_SAVE_EVERY = int(
+    os.environ.get("LAMMPS_MODEL_WORKERS_SAVE_EVERY", 10)
+)
+
+# Every sample learned through /data/learn/ is logged (app/example/events.py),
+# with a snapshot of each model every few events, so a model can be rebuilt.
+# Compaction keeps at least the most recent events, and a few snapshots.
+# Set LAMMPS_EVENT_LOG to an empty string to not keep a log.
+LAMMPS_EVENT_LOG = os.environ.get(
+    "LAMMPS_EVENT_LOG", os.path.join(BASE_DIR, "learn-events.sqlite3")
+)
+LAMMPS_EVENT_SNAPSHOT_EVERY = int(os.environ.get("LAMMPS_EVENT_SNAPSHOT_EVERY", 100))
+LAMMPS_EVENT_COMPACT_EVERY = 1000
+LAMMPS_EVENT_LOG_KEEP = int(os.environ.get("LAMMPS_EVENT_LOG_KEEP", 10000))
+LAMMPS_EVENT_SNAPSHOTS_KEEP = 2
+
+# Versions of the linear models (app/example/versions.py) every few events,
+# as the values that changed, with a full version every LAMMPS_VERSION_BASE_EVERY.
+# We keep every one of the most recent versions, and at most the bases before.
+LAMMPS_VERSION_EVERY = int(os.environ.get("LAMMPS_VERSION_EVERY", 10))
+LAMMPS_VERSION_BASE_EVERY = 20
+LAMMPS_VERSIONS_RECENT = int(os.environ.get("LAMMPS_VERSIONS_RECENT", 200))
+LAMMPS_VERSIONS_MAX_BASES = 500
+
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get('SECRET_KEY') or "@=n*^a0q4($45&jl5x+8_f_1yt5w+brp^&r5tk@5_yt-4=h27f"
 
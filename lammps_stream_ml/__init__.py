@@ -0,0 +1 @@
+from .version import __version__
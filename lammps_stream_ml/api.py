@@ -0,0 +1,371 @@
+# A riverapi client for the ml-server that keeps connections alive between
+# runs, times every request, and uses the batch endpoints of the example app
+# (predictions from every model, uncertainty, quantiles, scaling over nodes, a
+# summary of all models, and tables of predictions for a grid) when the
+# server has them.
+
+import collections
+import math
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from riverapi.logger import logger
+from riverapi.main import Client
+
+
+# Responses from a server that does not have an endpoint (an older image)
+missing = [404, 405]
+
+
+class LatencyHistogram:
+    """
+    Power of two histogram of request latencies, in milliseconds.
+
+    Bucket 0 holds everything under 1ms, and bucket i holds [2^(i-1), 2^i) ms.
+    We only keep counts, so memory does not grow with the number of requests.
+    """
+
+    def __init__(self):
+        self.buckets = collections.Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        bucket = 0 if ms < 1 else int(math.log2(ms)) + 1
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        """
+        Upper bound (ms) of the bucket holding the q quantile.
+        """
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= q * self.count:
+                return min(2**bucket, self.max)
+        return self.max
+
+    def show(self, title):
+        print(f"\n⏱️  {title}")
+        print(
+            f"     requests: {self.count} mean: {self.mean:.2f}ms "
+            f"p50: <{self.quantile(0.5):.2f}ms p99: <{self.quantile(0.99):.2f}ms max: {self.max:.2f}ms"
+        )
+        for bucket in sorted(self.buckets):
+            low = 0 if bucket == 0 else 2 ** (bucket - 1)
+            bar = "#" * max(1, int(40 * self.buckets[bucket] / self.count))
+            print(f"  {low:>7}ms+ | {bar} {self.buckets[bucket]}")
+
+
+class PooledSession(requests.Session):
+    """
+    A keep-alive session with a connection pool and a default timeout.
+
+    Every request is timed on the client side, and added to a latency
+    histogram for the method and path requested.
+    """
+
+    def __init__(self, pool_size=4, timeout=30):
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+        self.headers["Connection"] = "keep-alive"
+        self.timeout = timeout
+        self.latency = {}
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        try:
+            return super().request(method, url, *args, **kwargs)
+        finally:
+            key = f"{method.upper()} {urlparse(url).path}"
+            if key not in self.latency:
+                self.latency[key] = LatencyHistogram()
+            self.latency[key].add((time.perf_counter() - start) * 1000)
+
+
+class PooledClient(Client):
+    """
+    A riverapi client that sends all requests through a pooled session.
+
+    The riverapi Client issues its requests with requests.request (only a
+    retry after authentication uses self.session), so we override do_request
+    to give every call keep-alive connections, the timeout, and latency
+    tracking.
+    """
+
+    def __init__(self, baseurl, pool_size=4, timeout=30, **kwargs):
+        super().__init__(baseurl, **kwargs)
+        self.url = baseurl.rstrip("/")
+        self.session = PooledSession(pool_size=pool_size, timeout=timeout)
+
+        # Time spent computing predictions, as reported by the server
+        self.server_latency = LatencyHistogram()
+        self.can_batch = True
+        self.can_learn_all = True
+
+    def do_request(
+        self,
+        typ,
+        url,
+        data=None,
+        json=None,
+        headers=None,
+        return_json=True,
+        stream=False,
+    ):
+        """
+        Do a request as riverapi does, but through the pooled session.
+        """
+        headers = headers or {}
+        headers.update(self.headers)
+        if not self.quiet:
+            logger.info("%s %s" % (typ.upper(), url))
+
+        # The first post when you upload the model defines the flavor
+        body = {"json": json} if json else {"data": data}
+        r = self.session.request(
+            typ, self.apiroot + url, headers=headers, stream=stream, **body
+        )
+        if not self.quiet and not stream and return_json:
+            self.print_response(r)
+        return self.check_response(typ, r, return_json=return_json, stream=stream)
+
+    def predict_all(self, x, models=None):
+        """
+        Get a prediction from every model (or those named) in one round trip.
+
+        If the server does not provide the batch endpoint (an older image)
+        we fall back to asking each model in turn. Any other error is retried
+        once, and then raised, so one failure does not end batching.
+        """
+        if self.can_batch:
+            data = {"x": x}
+            if models:
+                data["models"] = models
+            for _ in range(2):
+                res = self.session.post(f"{self.url}/data/predict/", json=data)
+                if res.status_code in missing or res.status_code == 200:
+                    break
+            if res.status_code == 200:
+                result = res.json()
+                self.server_latency.add(result["duration"] * 1000)
+                return result["predictions"]
+            if res.status_code not in missing:
+                res.raise_for_status()
+            print(f"Batch predict not available ({res.status_code}), using per model")
+            self.can_batch = False
+        return {
+            model_name: self.predict(model_name, x=x)["prediction"]
+            for model_name in models or self.models()["models"]
+        }
+
+    def learn_all(self, x, y, models=None):
+        """
+        Test then train every model (or those named) on one sample.
+
+        Each model predicts x before it learns, and we return the predictions,
+        rolling metrics, and errors by model. If the server does not provide
+        the endpoint (an older image) each model learns in turn, and there
+        are no predictions or metrics. Any other error is raised, and not
+        retried, since some models may have learned the sample.
+        """
+        if self.can_learn_all:
+            data = {"x": x, "y": y}
+            if models:
+                data["models"] = models
+            res = self.session.post(f"{self.url}/data/learn/", json=data)
+            if res.status_code == 200:
+                return res.json()
+            if res.status_code not in missing:
+                res.raise_for_status()
+            print(f"Test then train not available ({res.status_code}), using learn")
+            self.can_learn_all = False
+        errors = {}
+        for model_name in models or self.models()["models"]:
+            res = self.learn(model_name, x=x, y=y)
+            if "successful learn" not in res.lower():
+                errors[model_name] = res
+        return {"predictions": {}, "metrics": {}, "errors": errors}
+
+    def prequential(self, models=None):
+        """
+        Rolling (test then train) metrics of each model over the samples.
+
+        This is None if the server does not keep them (an older image).
+        """
+        params = {"model": models} if models else None
+        res = self.session.get(f"{self.url}/data/prequential/", params=params)
+        if res.status_code != 200:
+            return None
+        return res.json()
+
+    def as_of(self, model_name, n, points=None):
+        """
+        A model as it was after the server learned n samples (events).
+
+        Without points we return the weights of a linear model (an export),
+        and with them the predictions for each point, and how we got them.
+        This is None if the server cannot (no log, or an older image).
+        """
+        url = f"{self.url}/data/versions/{model_name}/"
+        if points is None:
+            res = self.session.get(url, params={"n": n})
+        else:
+            res = self.session.post(url, json={"n": n, "points": points})
+        if res.status_code != 200:
+            print(f"Cannot get {model_name} as of {n} ({res.status_code})")
+            return None
+        return res.json()
+
+    def races(self):
+        """
+        Leaderboards of the models that race variants, by model name.
+
+        This is empty if the server has none (or is an older image).
+        """
+        res = self.session.get(f"{self.url}/data/races/")
+        if res.status_code != 200:
+            return {}
+        return res.json()["races"]
+
+    def get_export(self, model_name, version=None):
+        """
+        Scaler statistics and weights of a linear model, if it changed.
+
+        If the server has the same version we have it answers 304, and we
+        return just {"version": version}. We return None if the model cannot
+        be exported (or the server is an older image).
+        """
+        headers = {"If-None-Match": f'"{version}"'} if version else {}
+        res = self.session.get(
+            f"{self.url}/data/model/export/{model_name}/", headers=headers
+        )
+        if res.status_code == 304:
+            return {"version": version}
+        if res.status_code != 200:
+            return None
+        return res.json()
+
+    def uncertainty(self, candidates, model_name=None):
+        """
+        Ask the server for the predictive standard deviation of each candidate.
+
+        If no model can answer, we return the same score for all, and the
+        sampler falls back to a random choice.
+        """
+        data = {"candidates": candidates}
+        if model_name:
+            data["model"] = model_name
+        res = self.session.post(f"{self.url}/data/uncertainty/", json=data)
+        if res.status_code != 200:
+            print(f"Cannot get uncertainty ({res.status_code}), choosing at random")
+            return [0] * len(candidates)
+        return res.json()["sigma"]
+
+    def quantiles(self, points):
+        """
+        Predicted quantiles of the target for each point, in one request.
+
+        We return {"quantiles": [...], "models": {...}} where each point has a
+        dictionary by quantile (e.g., "0.5", "0.95"), and models is the model
+        for each. This is None if the server has no quantile models (or is an
+        older image).
+        """
+        res = self.session.post(f"{self.url}/data/quantiles/", json={"points": points})
+        if res.status_code != 200:
+            print(f"Cannot get predicted quantiles ({res.status_code})")
+            return None
+        return res.json()
+
+    def scaling(self, x, nodes, ranks_per_node=1, model_name=None, log_target=False):
+        """
+        Predicted time to solution for x over numbers of nodes.
+
+        We return the curve (time, node seconds, and parallel efficiency for
+        each number of nodes) and which is fastest, cheapest, and the fastest
+        that is efficient, or None if the server cannot (an older image).
+        """
+        data = {
+            "x": x,
+            "nodes": nodes,
+            "ranks_per_node": ranks_per_node,
+            "log_target": log_target,
+        }
+        if model_name:
+            data["model"] = model_name
+        res = self.session.post(f"{self.url}/data/scaling/", json=data)
+        if res.status_code != 200:
+            print(f"Cannot get the scaling curve ({res.status_code})")
+            return None
+        return res.json()
+
+    def declare_grid(self, space):
+        """
+        Ask the server to keep a table of predictions for every point of space.
+
+        Predictions for points on the grid are then lookups. We return False
+        if the server cannot (an older image, or the space is too large).
+        """
+        res = self.session.post(f"{self.url}/data/grid/", json={"space": space})
+        if res.status_code != 200:
+            print(f"Cannot declare a prediction grid ({res.status_code})")
+            return False
+        return True
+
+    def predict_grid(self, models=None):
+        """
+        Predictions from every model (or those named) for the whole grid.
+
+        We return the space and, for each model, the predictions in row major
+        order of the features sorted by name, or None if there is no grid.
+        """
+        params = {"model": models} if models else None
+        res = self.session.get(f"{self.url}/data/grid/", params=params)
+        if res.status_code != 200:
+            return None
+        return res.json()
+
+    def show_latency(self):
+        """
+        Show client side latency for each endpoint, and server compute time.
+
+        A large gap between the two points to the network (or the web server)
+        and not the models as the bottleneck.
+        """
+        for key, histogram in sorted(self.session.latency.items()):
+            histogram.show(f"Client latency for {key}")
+        if self.server_latency.count:
+            self.server_latency.show("Server compute time for batch predictions")
+
+
+def get_summary(cli):
+    """
+    Get stats, metrics and parameters for all models in one request.
+
+    If the server does not provide the summary endpoint (an older image) we
+    ask for each model in turn.
+    """
+    res = cli.session.get(f"{cli.url}/data/models/summary/")
+    if res.status_code == 200:
+        return res.json()["models"]
+    return {
+        model_name: {
+            "stats": cli.stats(model_name),
+            "metrics": cli.metrics(model_name),
+            "model": cli.get_model_json(model_name),
+        }
+        for model_name in cli.models()["models"]
+    }
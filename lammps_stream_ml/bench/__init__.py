@@ -0,0 +1 @@
+# Offline benchmarks (nothing is sent to the server).
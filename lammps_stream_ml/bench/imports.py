@@ -0,0 +1,114 @@
+# How long it takes to import what each command needs, with python -X importtime.
+# The runner can be started many times (e.g., for every flux job), so every
+# command has a budget. Heavy modules (river, the client) should only be
+# imported by the commands that use them, and going over the budget is an error.
+
+# lammps-stream-ml bench imports
+
+import os
+import subprocess
+import sys
+
+import lammps_stream_ml
+
+# Budget (milliseconds) for the modules each command imports, on top of
+# starting python. The parser is for every command (and --help).
+budgets = {
+    # --help, --version, and the parser for every command
+    "lammps_stream_ml.cli": 50,
+    # train and predict need the client (predict imports river when it starts)
+    "lammps_stream_ml.cli.run": 250,
+    "lammps_stream_ml.cli.replay": 250,
+    "lammps_stream_ml.cli.plan": 250,
+    # Parse a LAMMPS log
+    "lammps_stream_ml.lammps_log": 20,
+}
+
+# The directory with the package, so we can run from a clone
+root = os.path.dirname(os.path.dirname(os.path.abspath(lammps_stream_ml.__file__)))
+
+
+def parse_importtime(output):
+    """
+    Each import as (level, cumulative microseconds, name, imported by).
+
+    Lines are "import time: self | cumulative | name", and a module imported
+    by another is indented (two spaces per level) and listed before it.
+    """
+    lines = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split(":", 1)[1].split("|")
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        lines.append((level, int(cumulative), name.strip()))
+
+    # Read backwards, so each module comes before what it imported
+    imports = []
+    parents = []
+    for level, cumulative, name in reversed(lines):
+        parents = parents[:level]
+        imports.append((level, cumulative, name, parents[-1] if parents else None))
+        parents.append(name)
+    return imports
+
+
+def measure(code):
+    """
+    Imports (and their time) to run code in a new python.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=root,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"Cannot run {code}:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def measure_module(module, baseline, repeats):
+    """
+    Time (ms) to import a module past starting python, and what took longest.
+
+    The heaviest are the first modules (not ours) that our modules import.
+    We keep the fastest of repeats, since anything slower is noise.
+    """
+    best = None
+    for _ in range(repeats):
+        imports = [x for x in measure(f"import {module}") if x[2] not in baseline]
+        total = sum(us for level, us, _, _ in imports if level == 0) / 1000
+        if best is not None and total >= best[0]:
+            continue
+        heaviest = sorted(
+            [
+                (us, name)
+                for level, us, name, parent in imports
+                if not name.startswith("lammps_stream_ml")
+                and (parent is None or parent.startswith("lammps_stream_ml"))
+            ],
+            reverse=True,
+        )
+        best = (total, heaviest[:3])
+    return best
+
+
+def main(args):
+    baseline = {name for _, _, name, _ in measure("pass")}
+    print(f"Import time of each command (fastest of {args.repeats}), past startup\n")
+    print(f"{'module':>30} {'ms':>9} {'budget':>7}  heaviest imports")
+
+    over = []
+    for module, budget in budgets.items():
+        budget *= args.scale
+        total, heaviest = measure_module(module, baseline, args.repeats)
+        heaviest = ", ".join(f"{name} {us / 1000:.1f}" for us, name in heaviest)
+        flag = "" if total <= budget else " over!"
+        print(f"{module:>30} {total:>9.1f} {budget:>7.0f}{flag}  {heaviest}")
+        if total > budget:
+            over.append(module)
+
+    if over:
+        sys.exit(f"\n{', '.join(over)} took longer to import than the budget.")
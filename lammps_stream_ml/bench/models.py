@@ -0,0 +1,107 @@
+# Compare models offline, on LAMMPS runs we already recorded. Every model we
+# create (and new candidates) sees the runs in order, and predicts each run
+# before it learns from it (prequential evaluation), as it would on the server.
+# Along with accuracy we report what it costs to serve each model: learns and
+# predictions per second, and its size when it is saved (pickled, as the
+# server stores it).
+
+# lammps-stream-ml bench models results/lammps-ml/lammps-predict.json
+
+import json
+import pickle
+import sys
+import time
+
+from river import metrics
+
+from lammps_stream_ml import fields, models
+
+
+def evaluate(model, runs, args):
+    """
+    Prequential evaluation of one model on the runs, in order.
+    """
+    scores = {
+        "mean_absolute_error": metrics.MAE(),
+        "root_mean_squared_error": metrics.RMSE(),
+        "r_squared": metrics.R2(),
+    }
+    learn_time = 0.0
+    predict_time = 0.0
+
+    for x, y in runs:
+        start = time.perf_counter()
+        pred = model.predict_one(x)
+        predict_time += time.perf_counter() - start
+
+        # Scores are in the units of the target, like predict reports
+        if pred is not None:
+            for score in scores.values():
+                score.update(y, fields.from_target(args, pred))
+
+        start = time.perf_counter()
+        model.learn_one(x, fields.to_target(args, y))
+        learn_time += time.perf_counter() - start
+
+    # What it takes to save (e.g., upload) the model, as the server stores it
+    try:
+        saved = len(pickle.dumps(model))
+    except Exception:
+        saved = None
+    return {
+        **{name: score.get() for name, score in scores.items()},
+        "learn_per_second": len(runs) / learn_time if learn_time else None,
+        "predict_per_second": len(runs) / predict_time if predict_time else None,
+        "saved_bytes": saved,
+    }
+
+
+def get_models(args):
+    """
+    The models to compare, by name: the ones we create, and candidates.
+    """
+    choices = {
+        **models.get_models(),
+        **models.get_race(),
+        **models.get_candidates(seed=args.seed),
+    }
+    if not args.models:
+        return choices
+    names = args.models.split(",")
+    for name in names:
+        if name not in choices:
+            sys.exit(f"{name} is not a known model, choices are {', '.join(choices)}")
+    return {name: choices[name] for name in names}
+
+
+def show_size(value):
+    return "-" if value is None else f"{value / 1024:.1f}"
+
+
+def main(args):
+    runs = []
+    for filename in args.results:
+        runs += list(fields.iter_recorded(args, filename))
+    if not runs:
+        sys.exit(f"There are no recorded runs in {', '.join(args.results)}")
+
+    print(f"Prequential evaluation on {len(runs)} recorded runs")
+    print(
+        f"\n{'model':>26} {'MAE':>9} {'RMSE':>9} {'R2':>7} {'learn/s':>9} "
+        f"{'predict/s':>10} {'saved KB':>9}"
+    )
+    results = {}
+    for name, model in get_models(args).items():
+        result = evaluate(model, runs, args)
+        results[name] = result
+        print(
+            f"{name:>26} {result['mean_absolute_error']:>9.3f} "
+            f"{result['root_mean_squared_error']:>9.3f} {result['r_squared']:>7.3f} "
+            f"{result['learn_per_second'] or 0:>9.0f} "
+            f"{result['predict_per_second'] or 0:>10.0f} "
+            f"{show_size(result['saved_bytes']):>9}"
+        )
+
+    if args.out:
+        with open(args.out, "w") as fd:
+            fd.write(json.dumps(results, indent=4))
@@ -0,0 +1,92 @@
+# Simulate packing batches of LAMMPS jobs onto a cluster, with run times we
+# already recorded. A model learns from the first runs, and for each batch of
+# the rest we compare the makespan (with the recorded, true run times) of
+# running the jobs in the order they come, packing them by predicted run time
+# (LPT), and packing them by the true run time (the best LPT could do). After
+# each batch the model learns from its runs, as the server would.
+
+# lammps-stream-ml bench packing results/lammps-ml/lammps-predict.json
+
+import sys
+
+from lammps_stream_ml import fields, models, packing
+
+
+def get_model(args):
+    choices = {**models.get_models(), **models.get_candidates(seed=args.seed)}
+    if args.model not in choices:
+        sys.exit(f"{args.model} is not a known model, choices are {', '.join(choices)}")
+    return choices[args.model]
+
+
+def simulate(jobs, args):
+    """
+    Makespan of a batch of jobs for each way of ordering them.
+    """
+
+    def runtime(job):
+        return job["runtime"]
+
+    def predicted(job):
+        return job["predicted"]
+
+    in_order = packing.list_schedule(jobs, args.total_nodes, runtime)
+    by_predicted = packing.list_schedule(
+        packing.lpt_order(jobs, predicted), args.total_nodes, runtime
+    )
+    return {
+        "in order": packing.makespan(in_order),
+        "lpt (predicted)": packing.makespan(by_predicted),
+        "lpt (true)": packing.makespan(packing.lpt(jobs, args.total_nodes, runtime)),
+        "lower bound": packing.lower_bound(jobs, args.total_nodes, runtime),
+    }
+
+
+def main(args):
+    if args.nodes > args.total_nodes:
+        sys.exit(f"Jobs need --nodes {args.nodes} of --total-nodes {args.total_nodes}")
+    runs = []
+    for filename in args.results:
+        runs += list(fields.iter_recorded(args, filename))
+    start = int(len(runs) * args.train)
+    if len(runs) - start < args.batch:
+        sys.exit(f"There are {len(runs)} recorded runs, too few for a batch")
+
+    model = get_model(args)
+    models.learn(model, [(x, fields.to_target(args, y)) for x, y in runs[:start]])
+    print(
+        f"Packing {len(runs) - start} recorded runs in batches of {args.batch} "
+        f"onto {args.total_nodes} nodes ({args.nodes} per job)\n"
+        f"{args.model} learned from the first {start} runs"
+    )
+
+    totals = {}
+    batches = 0
+    for offset in range(start, len(runs) - args.batch + 1, args.batch):
+        batch = runs[offset : offset + args.batch]
+        jobs = [
+            {
+                "features": x,
+                "runtime": y,
+                "predicted": fields.from_target(args, model.predict_one(x)) or 0.0,
+                # A recorded run took its time on the nodes it had
+                "nodes": x.get("nodes", args.nodes),
+            }
+            for x, y in batch
+        ]
+        try:
+            makespans = simulate(jobs, args)
+        except ValueError as e:
+            sys.exit(str(e))
+        for name, value in makespans.items():
+            totals[name] = totals.get(name, 0.0) + value
+        batches += 1
+
+        # When the batch is done, the models learn from it
+        for x, y in batch:
+            model.learn_one(x, fields.to_target(args, y))
+
+    print(f"\n{'order':>16} {'makespan':>12} {'vs in order':>12}  ({batches} batches)")
+    for name, total in totals.items():
+        change = 100 * (total - totals["in order"]) / totals["in order"]
+        print(f"{name:>16} {total:>12.2f} {change:>11.1f}%")
@@ -0,0 +1,121 @@
+# Compare samplers offline, on LAMMPS runs we already recorded (a campaign
+# checkpoint, or the output of predict --out). Each sampler proposes a point,
+# and we "run" it by taking the closest recorded run not yet used. A model
+# learns from each run, and we report how many runs it took to reach a target
+# R squared on all of the recorded data.
+
+# lammps-stream-ml bench samplers results/lammps-ml/lammps-predict.json
+
+import statistics
+import sys
+
+from river import linear_model
+
+from lammps_stream_ml import campaign, samplers
+
+
+def r_squared(model, dims, y_true):
+    """
+    Coefficient of determination of the model over all recorded runs.
+    """
+    mean = statistics.fmean(y_true)
+    total = sum((y - mean) ** 2 for y in y_true)
+    residual = sum((y - model.predict_one(x)) ** 2 for x, y in zip(dims, y_true))
+    return 1 - residual / total if total else 0.0
+
+
+class Recorded:
+    """
+    Recorded runs, served nearest first to points a sampler proposes.
+    """
+
+    def __init__(self, dims, y_true):
+        self.dims = dims
+        self.y_true = y_true
+        self.names = list(dims[0])
+        self.space = {
+            name: sorted({point[name] for point in dims}) for name in self.names
+        }
+        self.scale = {
+            name: (max(values) - min(values)) or 1 for name, values in self.space.items()
+        }
+        self.unused = set(range(len(dims)))
+
+    def reset(self):
+        self.unused = set(range(len(self.dims)))
+
+    def run(self, point):
+        """
+        "Run" a point, returning the closest recorded run we have not used.
+        """
+
+        def distance(index):
+            return sum(
+                ((self.dims[index][name] - point[name]) / self.scale[name]) ** 2
+                for name in self.names
+            )
+
+        index = min(self.unused, key=distance)
+        self.unused.remove(index)
+        return self.dims[index], self.y_true[index]
+
+
+def benchmark(name, recorded, args, seed):
+    """
+    Run one sampler, returning runs to reach the target and the final R squared.
+    """
+    recorded.reset()
+    model = linear_model.BayesianLinearRegression()
+
+    # The uncertainty sampler asks the same model we are training
+    def score(candidates):
+        return [model.predict_one(x, with_dist=True).sigma for x in candidates]
+
+    sampler = samplers.get_sampler(
+        name, recorded.space, n=args.runs, score=score, seed=seed
+    )
+    reached = None
+    r2 = None
+    for run in range(1, args.runs + 1):
+        x, y = recorded.run(sampler.sample())
+        model.learn_one(x, y)
+        if run % args.every == 0 or run == args.runs:
+            r2 = r_squared(model, recorded.dims, recorded.y_true)
+            if reached is None and r2 >= args.r2:
+                reached = run
+    return reached, r2
+
+
+def main(args):
+    dims, y_true = [], []
+    for features, target in campaign.iter_runs(args.results):
+        dims.append(features)
+        y_true.append(target)
+    if not dims:
+        sys.exit(f"There are no recorded runs in {args.results}")
+    recorded = Recorded(dims, y_true)
+    args.runs = min(args.runs or len(recorded.dims), len(recorded.dims))
+
+    names = args.samplers.split(",")
+    for name in names:
+        if name not in samplers.samplers:
+            sys.exit(f"{name} is not a known sampler.")
+
+    print(
+        f"Comparing samplers on {len(recorded.dims)} recorded runs, "
+        f"target R squared {args.r2} within {args.runs} runs\n"
+    )
+    print(f"{'sampler':>12} {'reached':>8} {'runs (mean)':>12} {'final R2':>9}")
+    for name in names:
+        reached = []
+        final = []
+        for seed in range(args.repeats):
+            runs, r2 = benchmark(name, recorded, args, seed)
+            final.append(r2)
+            if runs is not None:
+                reached.append(runs)
+        mean_runs = f"{statistics.fmean(reached):.1f}" if reached else "-"
+        print(
+            f"{name:>12} {len(reached):>3}/{args.repeats:<4} {mean_runs:>12} "
+            f"{statistics.fmean(final):>9.3f}"
+        )
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+# The state of a train or predict campaign (completed runs, predictions and
+# where the sampler is) checkpointed after every run. A campaign can take
+# hours of cluster time, so if it is interrupted we want to resume it and
+# not start over. The checkpoint is json lines: a header that describes the
+# campaign, and then one line per completed run, so saving a run is one
+# small append no matter how long the campaign is. The state of the sampler
+# (e.g., a random generator, or the points it has seen) can be kilobytes and
+# grow with the campaign, so it is not in every line. It is in a file next to
+# the checkpoint that we replace after each run.
+
+import json
+import os
+
+from . import columnar
+
+
+class Campaign:
+    """
+    Results of a campaign, in memory and (optionally) in a checkpoint file.
+
+    Each completed predict run is passed to listeners (anything with an
+    add(record) e.g., metrics or an output file). If keep is False we don't
+    hold on to the results in memory, and leave it to the listeners.
+    """
+
+    def __init__(self, header, filename=None, keep=True, listeners=None):
+        self.header = header
+        self.filename = filename
+        self.sampler_file = f"{filename}.sampler" if filename else None
+        self.keep = keep
+        self.listeners = listeners or []
+        self.y_true = []
+        self.y_pred = {}
+        self.dims = []
+
+        # The next iteration to run, and the sampler state to continue from
+        self.iteration = 0
+        self.sampler = None
+        self.sampler_states = {}
+
+    def start(self, resume=False):
+        """
+        Start a new checkpoint, or resume from an existing one.
+        """
+        if not self.filename:
+            return
+        if resume:
+            return self.resume()
+        if os.path.exists(self.filename):
+            raise ValueError(
+                f"Checkpoint {self.filename} exists, use --resume or remove it."
+            )
+        with open(self.filename, "w") as fd:
+            fd.write(json.dumps(self.header) + "\n")
+
+    def resume(self):
+        """
+        Load completed runs from the checkpoint.
+
+        If we were interrupted while writing, the last line can be partial.
+        We drop it (truncate the file to the last complete run).
+        """
+        if not os.path.exists(self.filename):
+            raise ValueError(f"There is no checkpoint {self.filename} to resume.")
+
+        good = 0
+        with open(self.filename, "rb") as fd:
+            lines = iter(fd.readline, b"")
+            header = json.loads(next(lines))
+            for key, value in self.header.items():
+                if header.get(key) != value:
+                    raise ValueError(
+                        f"Checkpoint {self.filename} has {key} {header.get(key)}, "
+                        f"but this campaign has {value}."
+                    )
+            good = fd.tell()
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.add_record(record)
+                good = fd.tell()
+
+        with open(self.filename, "r+b") as fd:
+            fd.truncate(good)
+        self.load_sampler()
+        print(f"Resuming campaign from {self.filename} at iteration {self.iteration}")
+
+    def load_sampler(self):
+        """
+        Load the sampler state after the last completed run.
+
+        The sampler file has the states after the last two runs, since we
+        can be interrupted after saving it and before the run is appended.
+        Older checkpoints have the state in each line instead.
+        """
+        if self.iteration == 0 or not os.path.exists(self.sampler_file):
+            return
+        with open(self.sampler_file, "r") as fd:
+            self.sampler_states = json.loads(fd.read())
+        state = self.sampler_states.get(str(self.iteration - 1))
+        if state is not None:
+            self.sampler = state
+        elif self.sampler is None:
+            print(
+                f"There is no sampler state for iteration {self.iteration - 1} "
+                f"in {self.sampler_file}, the sampler starts again"
+            )
+
+    def save_sampler(self, iteration, sampler):
+        """
+        Replace the sampler file with the states after this run and the last.
+        """
+        last = {
+            key: value
+            for key, value in self.sampler_states.items()
+            if int(key) < iteration
+        }
+        last = {key: last[key] for key in sorted(last, key=int)[-1:]}
+        self.sampler_states = {**last, str(iteration): sampler}
+        with open(f"{self.sampler_file}.tmp", "w") as fd:
+            fd.write(json.dumps(self.sampler_states))
+            fd.flush()
+            os.fsync(fd.fileno())
+        os.replace(f"{self.sampler_file}.tmp", self.sampler_file)
+
+    def add_record(self, record):
+        """
+        Add a completed run to the results in memory.
+        """
+        self.iteration = record["iteration"] + 1
+        if record.get("sampler") is not None:
+            self.sampler = record["sampler"]
+        if record["predictions"] is None:
+            return
+        for listener in self.listeners:
+            listener.add(record)
+        if self.keep:
+            self.y_true.append(record["target"])
+            self.dims.append(record["features"])
+            for model_name, pred in record["predictions"].items():
+                if model_name not in self.y_pred:
+                    self.y_pred[model_name] = []
+                self.y_pred[model_name].append(pred)
+
+    def add(self, iteration, features, target, predictions=None, sampler=None):
+        """
+        Add a completed run, and save it to the checkpoint.
+
+        Predictions are only provided for a predict campaign. We flush and
+        sync the run to disk before moving on to the next. The sampler state
+        is saved first, so a run in the checkpoint always has one.
+        """
+        record = {
+            "iteration": iteration,
+            "features": features,
+            "target": target,
+            "predictions": predictions,
+        }
+        self.add_record(record)
+        self.sampler = sampler
+        if not self.filename:
+            return
+        if sampler is not None:
+            self.save_sampler(iteration, sampler)
+        with open(self.filename, "a") as fd:
+            fd.write(json.dumps(record) + "\n")
+            fd.flush()
+            os.fsync(fd.fileno())
+
+
+def is_checkpoint(filename):
+    """
+    A checkpoint starts with a (one line) header that describes the campaign.
+    """
+    if columnar.get_format(filename) in [".parquet", ".csv"]:
+        return False
+    with open(filename, "r") as fd:
+        line = fd.readline()
+    try:
+        header = json.loads(line)
+    except ValueError:
+        return False
+    return isinstance(header, dict) and "command" in header
+
+
+def iter_runs(filename):
+    """
+    Recorded runs (features and actual value) from a checkpoint or results.
+
+    A partial last line (an interrupted campaign) is skipped.
+    """
+    if not is_checkpoint(filename):
+        yield from columnar.iter_runs(filename)
+        return
+    with open(filename, "r") as fd:
+        next(fd)
+        for line in fd:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            yield record["features"], record["target"]
@@ -0,0 +1,609 @@
+#!/usr/bin/env python3
+
+# The lammps-stream-ml command line client. The parser only needs modules
+# from the standard library, and each command imports what it needs (the
+# riverapi client, river) when it runs, so --help is quick.
+
+import argparse
+import sys
+
+import lammps_stream_ml
+from lammps_stream_ml import lammps_log, launcher, samplers
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="LAMMPS Stream ML",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument(
+        "--version",
+        help="show software version and exit",
+        default=False,
+        action="store_true",
+    )
+    subparsers = parser.add_subparsers(
+        help="actions",
+        title="actions",
+        description="actions",
+        dest="command",
+    )
+
+    create = subparsers.add_parser(
+        "create",
+        description="create models on the server, optionally trained on recorded runs",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    train = subparsers.add_parser(
+        "train",
+        description="run lammps and train models",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    predict = subparsers.add_parser(
+        "predict",
+        description="test models by making predictions and comparing to truth",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    plan = subparsers.add_parser(
+        "plan",
+        description="pack a batch of lammps jobs onto nodes by predicted run time\n"
+        + "(longest first), and optionally submit them to flux in that order",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    replay = subparsers.add_parser(
+        "replay",
+        description="send recorded runs to the models, without running lammps",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    bench = subparsers.add_parser(
+        "bench",
+        description="offline benchmarks (nothing is sent to the server)",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+
+    # Add output file for test (actual and predictions)
+    predict.add_argument(
+        "--out",
+        help="Output json to write actual and predicted values with x,y,z\n"
+        + "Use a .parquet (requires pyarrow) or .csv file for a table that is\n"
+        + "written as we go, with one row per run and model",
+    )
+    predict.add_argument(
+        "--local",
+        help="predict with linear models here (weights from the server)\n"
+        + "other models are still predicted on the server",
+        default=False,
+        action="store_true",
+    )
+    predict.add_argument(
+        "--local-sync",
+        dest="local_sync",
+        help="seconds between checks for new weights (with --local)",
+        default=30,
+        type=float,
+    )
+
+    create.add_argument(
+        "--url",
+        help="URL where ml-server is deployed",
+        default="http://localhost",
+    )
+    create.add_argument(
+        "--warm-start",
+        dest="warm_start",
+        help="train the models on recorded runs before they are uploaded\n"
+        + "a campaign --checkpoint, predict --out (json, parquet or csv)\n"
+        + "or a --cache directory (can be given more than once)",
+        action="append",
+    )
+    create.add_argument(
+        "--batch-size",
+        dest="batch_size",
+        help="learn from this many runs at once (learn_many, requires pandas)\n"
+        + "models that cannot learn in batches learn one run at a time",
+        default=1,
+        type=int,
+    )
+    create.add_argument(
+        "--race-rung",
+        dest="race_rung",
+        help="runs before the race of model variants first halves them\n"
+        + "(each rung is twice as long as the last, 0 for no race)",
+        default=10,
+        type=int,
+    )
+    add_feature_arguments(create)
+
+    for command in [train, predict, plan, replay]:
+        add_server_arguments(command)
+    for command in [train, predict]:
+        add_run_arguments(command)
+
+    add_launch_arguments(plan)
+    plan.add_argument(
+        "--iters",
+        help="number of jobs to plan",
+        default=20,
+        type=int,
+    )
+    add_packing_arguments(plan)
+    plan.add_argument(
+        "--model",
+        help="model to predict run times (defaults to the median of all models)",
+    )
+    plan.add_argument(
+        "--time-limit-quantile",
+        dest="time_limit_quantile",
+        help="quantile of the predicted run time to use as the time limit\n"
+        + "of each job (flux -t), from the quantile models (0 for no limit)",
+        default=0.95,
+        type=float,
+    )
+    plan.add_argument(
+        "--time-limit-min",
+        dest="time_limit_min",
+        help="shortest time limit (seconds) for a job",
+        default=60,
+        type=int,
+    )
+    plan.add_argument(
+        "--submit",
+        help="submit the jobs with flux submit, in the order of the plan",
+        default=False,
+        action="store_true",
+    )
+    plan.add_argument(
+        "--out",
+        help="write the plan to json",
+    )
+    add_sampler_arguments(plan)
+    add_feature_arguments(plan)
+
+    replay.add_argument(
+        "results",
+        nargs="+",
+        help="recorded runs, a campaign --checkpoint or predict --out\n"
+        + "(json, parquet or csv)",
+    )
+    replay.add_argument(
+        "--predict",
+        help="predict the recorded runs and report metrics, instead of training",
+        default=False,
+        action="store_true",
+    )
+    add_target_arguments(replay)
+
+    benchmarks = bench.add_subparsers(
+        title="benchmarks",
+        description="benchmarks",
+        dest="benchmark",
+    )
+    bench_samplers = benchmarks.add_parser(
+        "samplers",
+        description="compare samplers on recorded runs",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    bench_samplers.add_argument(
+        "results",
+        help="recorded runs, a campaign --checkpoint or predict --out\n"
+        + "(json, parquet or csv)",
+    )
+    bench_samplers.add_argument(
+        "--r2",
+        help="target R squared to reach",
+        default=0.5,
+        type=float,
+    )
+    bench_samplers.add_argument(
+        "--runs",
+        help="maximum runs for each sampler (defaults to all recorded)",
+        type=int,
+    )
+    bench_samplers.add_argument(
+        "--repeats",
+        help="repeat each sampler with this many seeds",
+        default=5,
+        type=int,
+    )
+    bench_samplers.add_argument(
+        "--every",
+        help="evaluate R squared every N runs",
+        default=5,
+        type=int,
+    )
+    bench_samplers.add_argument(
+        "--samplers",
+        help="comma separated samplers to compare",
+        default=",".join(samplers.samplers),
+    )
+    bench_models = benchmarks.add_parser(
+        "models",
+        description="prequential evaluation of every model (and candidates)\n"
+        + "on recorded runs, with learn and predict throughput, and memory",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    bench_models.add_argument(
+        "results",
+        nargs="+",
+        help="recorded runs, a campaign --checkpoint, predict --out\n"
+        + "(json, parquet or csv) or a --cache directory",
+    )
+    bench_models.add_argument(
+        "--models",
+        help="comma separated models to compare (defaults to all)",
+    )
+    bench_models.add_argument(
+        "--seed",
+        help="random seed for models that use one",
+        default=42,
+        type=int,
+    )
+    bench_models.add_argument(
+        "--out",
+        help="write the results for each model to json",
+    )
+    add_feature_arguments(bench_models)
+
+    bench_packing = benchmarks.add_parser(
+        "packing",
+        description="simulate packing batches of recorded runs onto nodes\n"
+        + "in order, by predicted run time (LPT), and by true run time",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    bench_packing.add_argument(
+        "results",
+        nargs="+",
+        help="recorded runs, a campaign --checkpoint, predict --out\n"
+        + "(json, parquet or csv) or a --cache directory",
+    )
+    bench_packing.add_argument(
+        "--model",
+        help="model to predict run times",
+        default="linear-regression",
+    )
+    bench_packing.add_argument(
+        "--seed",
+        help="random seed for models that use one",
+        default=42,
+        type=int,
+    )
+    bench_packing.add_argument(
+        "--train",
+        help="fraction of the runs the model learns from before packing",
+        default=0.25,
+        type=float,
+    )
+    bench_packing.add_argument(
+        "--batch",
+        help="number of jobs to pack at once",
+        default=16,
+        type=int,
+    )
+    bench_packing.add_argument(
+        "--nodes",
+        help="number of nodes for each job",
+        default=1,
+        type=int,
+    )
+    add_packing_arguments(bench_packing)
+    add_feature_arguments(bench_packing)
+
+    bench_imports = benchmarks.add_parser(
+        "imports",
+        description="time to import what each command needs, against a budget",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    bench_imports.add_argument(
+        "--repeats",
+        help="import each in a new python this many times, and keep the fastest",
+        default=5,
+        type=int,
+    )
+    bench_imports.add_argument(
+        "--scale",
+        help="multiply every budget, e.g., for a slower machine",
+        default=1.0,
+        type=float,
+    )
+    return parser
+
+
+def get_numbers(value):
+    """
+    A comma separated list of positive numbers, sorted.
+    """
+    try:
+        numbers = sorted({int(number) for number in value.split(",")})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value} is not a list of numbers")
+    if numbers[0] < 1:
+        raise argparse.ArgumentTypeError(f"{value} must all be at least 1")
+    return numbers
+
+
+def add_server_arguments(command):
+    """
+    Arguments to connect to the ml-server.
+    """
+    command.add_argument(
+        "--url",
+        help="URL where ml-server is deployed",
+        default="http://localhost",
+    )
+    command.add_argument(
+        "--pool-size",
+        dest="pool_size",
+        help="number of keep-alive connections to hold open to the ml-server",
+        default=4,
+        type=int,
+    )
+    command.add_argument(
+        "--timeout",
+        help="timeout (seconds) for a single request to the ml-server",
+        default=30,
+        type=float,
+    )
+
+
+def add_packing_arguments(command):
+    """
+    Arguments for the cluster we pack jobs onto.
+    """
+    command.add_argument(
+        "--total-nodes",
+        dest="total_nodes",
+        help="number of nodes to pack jobs onto",
+        default=4,
+        type=int,
+    )
+
+
+def add_feature_arguments(command):
+    """
+    Arguments for the fields of a LAMMPS log the models learn from.
+    """
+    command.add_argument(
+        "--features",
+        help="comma separated fields from the LAMMPS log to send as features\n"
+        + "x,y,z,atoms,ranks and nodes are known before a run\n"
+        + "choices: "
+        + ",".join(lammps_log.fields),
+        default="x,y,z",
+    )
+    command.add_argument(
+        "--target",
+        help="field from the LAMMPS log to train on and predict\n"
+        + "elapsed is the job time in seconds, measured with a monotonic clock",
+        choices=lammps_log.fields,
+        default="elapsed",
+    )
+    add_target_arguments(command)
+
+
+def add_target_arguments(command):
+    """
+    Arguments for how the target is learned, shared with recorded runs.
+    """
+    command.add_argument(
+        "--log-target",
+        dest="log_target",
+        help="train on log(1 + target), and transform predictions back\n"
+        + "use this for both train and predict of the same models",
+        default=False,
+        action="store_true",
+    )
+
+
+def add_run_arguments(command):
+    """
+    Arguments to run lammps, choose parameters, and keep track of the campaign.
+    """
+    add_launch_arguments(command)
+    command.add_argument(
+        "--iters",
+        help="iterations to run of lammps",
+        default=20,
+        type=int,
+    )
+    command.add_argument(
+        "--checkpoint",
+        help="file to checkpoint the campaign after each run",
+    )
+    command.add_argument(
+        "--resume",
+        help="resume the campaign from --checkpoint",
+        default=False,
+        action="store_true",
+    )
+    command.add_argument(
+        "--cache",
+        help="directory to cache LAMMPS results, so repeated runs are not run again",
+    )
+    command.add_argument(
+        "--cache-mode",
+        dest="cache_mode",
+        help="use: return cached results for repeated runs (default)\n"
+        + "record: always run, and save (replace) results in the cache",
+        choices=["use", "record"],
+        default="use",
+    )
+    command.add_argument(
+        "--container-digest",
+        dest="container_digest",
+        help="digest of the container for the cache (computed from the file if not set)",
+    )
+    add_sampler_arguments(command)
+    add_feature_arguments(command)
+
+
+def add_launch_arguments(command):
+    """
+    Arguments for how to launch lammps, and the ranges of x, y, and z.
+    """
+    command.add_argument(
+        "--launcher",
+        help="flux: run each job with flux and singularity --container (default)\n"
+        + "mpirun: run lmp with mpirun, e.g., in the lammps container",
+        choices=launcher.launchers,
+        default="flux",
+    )
+    command.add_argument(
+        "--workdir",
+        default="/opt/lammps/examples/reaxff/HNS",
+        help="Working directory to run lammps from.",
+    )
+    command.add_argument(
+        "--container",
+        help="Path to container to run with lammps",
+    )
+    command.add_argument(
+        "--in",
+        dest="inputs",
+        default="in.reaxc.hns -nocite",
+        help="Input and parameters for lammps",
+    )
+    command.add_argument(
+        "--nodes",
+        help="number of nodes (N)",
+        default=1,
+        type=int,
+    )
+    command.add_argument(
+        "--log",
+        help="write log to path (keep in mind Singularity container is read only)",
+        default="/tmp/lammps.log",
+    )
+    command.add_argument(
+        "--np",
+        help="number of processes per node",
+        default=4,
+        type=int,
+    )
+    command.add_argument(
+        "--nodes-choices",
+        dest="nodes_choices",
+        help="comma separated numbers of nodes to choose from for each run\n"
+        + "(sampled with x, y, and z, instead of --nodes)",
+        type=get_numbers,
+    )
+    command.add_argument(
+        "--np-choices",
+        dest="np_choices",
+        help="comma separated numbers of processes to choose from for each run\n"
+        + "(sampled with x, y, and z, instead of --np)",
+        type=get_numbers,
+    )
+
+    # Mins and maxes for each parameter - I decided to allow up to 32, 32, 32 for testing.
+    # On the cluster with cpu affinity set this is 4 minutes 41 seconds
+    command.add_argument(
+        "--x-min",
+        dest="x_min",
+        help="min dimension for x",
+        default=1,
+        type=int,
+    )
+    command.add_argument(
+        "--x-max",
+        dest="x_max",
+        help="max dimension for x",
+        default=32,
+        type=int,
+    )
+    command.add_argument(
+        "--y-min",
+        dest="y_min",
+        help="min dimension for y",
+        default=1,
+        type=int,
+    )
+    command.add_argument(
+        "--y-max",
+        dest="y_max",
+        help="max dimension for y",
+        default=32,
+        type=int,
+    )
+    command.add_argument(
+        "--z-min",
+        dest="z_min",
+        help="min dimension for z",
+        default=1,
+        type=int,
+    )
+    command.add_argument(
+        "--z-max",
+        dest="z_max",
+        help="max dimension for z",
+        default=32,
+        type=int,
+    )
+
+
+def add_sampler_arguments(command):
+    """
+    Arguments for how to choose x, y, and z for each run.
+    """
+    command.add_argument(
+        "--sampler",
+        help="how to choose x, y, and z for each run\n"
+        + "grid visits every point once (shuffled) before repeating\n"
+        + "uncertainty asks the server where a model is least certain",
+        choices=list(samplers.samplers),
+        default="grid",
+    )
+    command.add_argument(
+        "--grid-checkpoint",
+        dest="grid_checkpoint",
+        help="file to save the position of the grid sampler, to resume from",
+    )
+    command.add_argument(
+        "--uncertainty-model",
+        dest="uncertainty_model",
+        help="model to ask for uncertainty (defaults to the first that can answer)",
+    )
+    command.add_argument(
+        "--seed",
+        help="random seed for the sampler",
+        type=int,
+    )
+
+
+def main(argv=None):
+    parser = get_parser()
+
+    def help(return_code=0):
+        print(f"\nLAMMPS Stream ML v{lammps_stream_ml.__version__}")
+        parser.print_help()
+        sys.exit(return_code)
+
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        help()
+
+    # If an error occurs while parsing the arguments, the interpreter will exit with value 2
+    args, extra = parser.parse_known_args(argv)
+
+    if args.version:
+        print(lammps_stream_ml.__version__)
+        sys.exit(0)
+
+    # Each command imports (only) what it needs
+    if args.command == "create":
+        from .create import main
+    elif args.command in ["train", "predict"]:
+        from .run import main
+    elif args.command == "plan":
+        from .plan import main
+    elif args.command == "replay":
+        from .replay import main
+    elif args.command == "bench":
+        from .bench import main
+    else:
+        help(1)
+
+    main(args=args, parser=parser, extra=extra)
+
+
+if __name__ == "__main__":
+    main()
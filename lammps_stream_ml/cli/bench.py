@@ -0,0 +1,25 @@
+# Offline benchmarks (nothing is sent to the server).
+
+import os
+import sys
+
+
+def main(args, parser, extra):
+    if not args.benchmark:
+        parser.parse_args(["bench", "--help"])
+    results = getattr(args, "results", [])
+    for filename in [results] if isinstance(results, str) else results:
+        if not os.path.exists(filename):
+            sys.exit(f"{filename} does not exist.")
+
+    # Each benchmark imports (only) what it needs
+    if args.benchmark == "samplers":
+        from lammps_stream_ml.bench.samplers import main
+    elif args.benchmark == "models":
+        from lammps_stream_ml.bench.models import main
+    elif args.benchmark == "packing":
+        from lammps_stream_ml.bench.packing import main
+    elif args.benchmark == "imports":
+        from lammps_stream_ml.bench.imports import main
+
+    main(args)
@@ -0,0 +1,44 @@
+# Create the models on the server. They can first be trained (warm started)
+# on runs we already recorded, so a new server serves useful predictions
+# right away, and not after hours of new LAMMPS runs.
+
+import os
+import sys
+
+from riverapi.main import Client
+
+from lammps_stream_ml import fields, models
+
+
+def main(args, parser, extra):
+    runs = []
+    for filename in args.warm_start or []:
+        if not os.path.exists(filename):
+            sys.exit(f"{filename} does not exist.")
+        found = [
+            (features, fields.to_target(args, target))
+            for features, target in fields.iter_recorded(args, filename)
+        ]
+        print(f"Found {len(found)} recorded runs to warm start with in {filename}")
+        runs += found
+
+    print(f"Preparing to create models for client URL {args.url}")
+
+    # Connect to the server running here
+    cli = Client(args.url)
+
+    # Upload several models to test for lammps - these are different kinds of regressions
+    # The quantile models predict an upper bound for a run, e.g., for a time limit
+    # and the race trains variants of the linear models to choose the best
+    created = {**models.get_models(), **models.get_quantile_models()}
+    if args.race_rung:
+        created.update(models.get_race(rung=args.race_rung))
+    for kind, model in created.items():
+        if runs:
+            try:
+                models.learn(model, runs, batch_size=args.batch_size)
+            except ValueError as e:
+                sys.exit(str(e))
+            print(f"Trained {kind} on {len(runs)} recorded runs")
+        model_name = cli.upload_model(model, "regression")
+        print(f"Created model {model_name} ({kind})")
@@ -0,0 +1,221 @@
+# Plan a batch of lammps jobs: choose x, y, and z for each, get predicted run
+# times from the ml-server in bulk, and pack the jobs onto --total-nodes so
+# the batch finishes as soon as possible (longest predicted first). With
+# --submit the jobs are submitted to flux in that order, and flux starts each
+# one as soon as there are nodes for it. The time limit for each job is a
+# quantile of its run time (p95 by default), from the quantile models.
+
+import math
+import os
+import statistics
+import subprocess
+import sys
+
+from lammps_stream_ml import launcher, packing
+from lammps_stream_ml.api import PooledClient
+from lammps_stream_ml.cli.run import get_sampler, validate, write_output
+from lammps_stream_ml.fields import from_target
+
+
+def get_features(args, point):
+    """
+    Features for a job we have not run, from what we know before it runs.
+    """
+    nodes, _, ranks = launcher.get_resources(args, point)
+    known = {**point, "nodes": nodes, "ranks": ranks}
+    names = args.features.split(",")
+    missing = [name for name in names if name not in known]
+    if missing:
+        sys.exit(
+            f"Cannot plan with {', '.join(missing)}, the features known before "
+            f"a run are {', '.join(known)}"
+        )
+    return {name: known[name] for name in names}
+
+
+def predict_grid(cli, args, space, points):
+    """
+    Predictions for every point, from the prediction tables of the server.
+
+    This is one request for the whole batch. We return None if the features
+    are not the space, or the server does not keep tables.
+    """
+    if set(args.features.split(",")) != set(space) or not cli.declare_grid(space):
+        return None
+    result = cli.predict_grid([args.model] if args.model else None)
+    if result is None:
+        return None
+
+    # Predictions are in row major order of the features sorted by name
+    names = sorted(result["space"])
+    offsets = {
+        name: {value: i for i, value in enumerate(result["space"][name])}
+        for name in names
+    }
+    predictions = []
+    for point in points:
+        position = 0
+        for name in names:
+            position = position * len(offsets[name]) + offsets[name][point[name]]
+        predictions.append(
+            {
+                model_name: table["predictions"][position]
+                for model_name, table in result["models"].items()
+            }
+        )
+    return predictions
+
+
+def get_runtimes(cli, args, space, jobs, exclude):
+    """
+    Predicted run time of each job, from --model or the median of all models.
+
+    Models we exclude (those for quantiles) do not predict the run time.
+    """
+    predictions = predict_grid(cli, args, space, [job["features"] for job in jobs])
+    if predictions is None:
+        print("Prediction tables are not available, predicting each job")
+        models = [args.model] if args.model else None
+        predictions = [cli.predict_all(job["features"], models) for job in jobs]
+
+    runtimes = []
+    for job, predicted in zip(jobs, predictions):
+        values = [
+            from_target(args, value)
+            for model_name, value in predicted.items()
+            if value is not None
+            and (model_name == args.model if args.model else model_name not in exclude)
+        ]
+        if not values:
+            sys.exit(f"There is no prediction for {job['features']}")
+        runtimes.append(max(0.0, statistics.median(values)))
+    return runtimes
+
+
+def get_time_limits(args, quantiles, count):
+    """
+    Time limit (seconds) for each job, from a quantile of its run time.
+
+    If there is no model for the quantile, jobs have no limit (None).
+    """
+    if not args.time_limit_quantile:
+        return [None] * count
+    key = str(args.time_limit_quantile)
+    if not quantiles or key not in quantiles["models"]:
+        print(f"There is no model for the {key} quantile, jobs have no time limit")
+        return [None] * count
+    return [
+        max(args.time_limit_min, math.ceil(from_target(args, result[key])))
+        for result in quantiles["quantiles"]
+    ]
+
+
+def show_plan(args, schedule):
+    def predicted(job):
+        return job["predicted"]
+
+    serial = sum(job["predicted"] for job in schedule)
+    in_order = packing.makespan(
+        packing.list_schedule(
+            sorted(schedule, key=lambda job: job["index"]), args.total_nodes, predicted
+        )
+    )
+    per_job = ",".join(map(str, args.nodes_choices or [args.nodes]))
+    print(
+        f"\n🗓️  Plan for {len(schedule)} jobs on {args.total_nodes} nodes "
+        f"({per_job} per job)"
+    )
+    print(
+        f"   predicted makespan {packing.makespan(schedule):.2f}s "
+        f"(in order {in_order:.2f}s, one at a time {serial:.2f}s)\n"
+    )
+    print(
+        f"{'job':>5} {'x':>4} {'y':>4} {'z':>4} {'predicted':>10} {'limit':>7} "
+        f"{'start':>9}  nodes"
+    )
+    for job in schedule:
+        point = job["point"]
+        limit = "-" if job["time_limit"] is None else job["time_limit"]
+        print(
+            f"{job['index']:>5} {point['x']:>4} {point['y']:>4} {point['z']:>4} "
+            f"{job['predicted']:>10.2f} {limit:>7} {job['start']:>9.2f}  "
+            + ",".join(str(host) for host in job["hosts"])
+        )
+
+
+def submit(args, executables, schedule):
+    """
+    Submit the jobs to flux in the order of the plan.
+
+    Flux starts jobs in the order they are submitted when there are nodes
+    for them, so this is the same list schedule.
+    """
+    root, ext = os.path.splitext(args.log)
+    print()
+    for job in schedule:
+        point = job["point"]
+        log = f"{root}-{job['index']}{ext}"
+        cmd = []
+        parts = launcher.get_command(
+            args,
+            executables,
+            point,
+            submit=True,
+            log=log,
+            time_limit=job["time_limit"],
+        )
+        for part in parts.values():
+            cmd += part
+        result = subprocess.run(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        if result.returncode != 0:
+            sys.exit(f"Cannot submit job {job['index']}:\n{result.stdout}")
+        job["jobid"] = result.stdout.strip()
+        print(f"Submitted job {job['index']} as {job['jobid']} (log {log})")
+
+
+def main(args, parser, extra):
+    validate(args)
+    widest = max(args.nodes_choices or [args.nodes])
+    if widest > args.total_nodes:
+        sys.exit(f"Jobs need {widest} nodes of --total-nodes {args.total_nodes}")
+
+    # Find the software we need to submit the jobs before we start
+    executables = None
+    if args.submit:
+        if args.launcher != "flux":
+            sys.exit("Jobs can only be submitted with the flux --launcher.")
+        executables = launcher.find_executables(args)
+
+    cli = PooledClient(args.url, pool_size=args.pool_size, timeout=args.timeout)
+    sampler = get_sampler(args, cli)
+    jobs = []
+    for index in range(args.iters):
+        point = sampler.sample()
+        jobs.append(
+            {
+                "index": index,
+                "point": point,
+                "features": get_features(args, point),
+                "nodes": launcher.get_resources(args, point)[0],
+            }
+        )
+
+    # The quantile models give time limits, and are not the run time
+    quantiles = cli.quantiles([job["features"] for job in jobs])
+    exclude = set(quantiles["models"].values()) if quantiles else set()
+    space = launcher.get_space(args)
+    for job, runtime in zip(jobs, get_runtimes(cli, args, space, jobs, exclude)):
+        job["predicted"] = runtime
+    limits = get_time_limits(args, quantiles, len(jobs))
+    for job, time_limit in zip(jobs, limits):
+        job["time_limit"] = time_limit
+
+    schedule = packing.lpt(jobs, args.total_nodes, lambda job: job["predicted"])
+    show_plan(args, schedule)
+    if args.submit:
+        submit(args, executables, schedule)
+    if args.out:
+        write_output(args.out, {"total_nodes": args.total_nodes, "jobs": schedule})
+    cli.show_latency()
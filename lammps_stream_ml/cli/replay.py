@@ -0,0 +1,43 @@
+# Send runs we already recorded (a campaign checkpoint, or predict results) to
+# the models, without running lammps. This can train new models on what we
+# learned before, or test them against runs we know the answer to.
+
+import json
+import os
+import sys
+
+from lammps_stream_ml import campaign
+from lammps_stream_ml.api import PooledClient
+from lammps_stream_ml.metrics import StreamingMetrics
+
+from .run import make_prediction, show_metrics, submit_train_result
+
+
+def main(args, parser, extra):
+    for filename in args.results:
+        if not os.path.exists(filename):
+            sys.exit(f"{filename} does not exist.")
+
+    cli = PooledClient(args.url, pool_size=args.pool_size, timeout=args.timeout)
+    res = cli.info()
+    print(json.dumps(res, indent=4))
+
+    streaming = StreamingMetrics() if args.predict else None
+    count = 0
+    for filename in args.results:
+        print(f"Replaying runs from {filename}")
+        for features, target in campaign.iter_runs(filename):
+            if target is None or any(value is None for value in features.values()):
+                continue
+            count += 1
+            if not args.predict:
+                submit_train_result(cli, args, features, target)
+                continue
+            predictions = dict(make_prediction(cli, args, features))
+            streaming.update(target, predictions)
+            streaming.show_progress()
+
+    print(f"\nReplayed {count} recorded runs")
+    if args.predict:
+        show_metrics(cli, streaming)
+    cli.show_latency()
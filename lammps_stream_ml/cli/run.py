@@ -0,0 +1,273 @@
+# Run lammps some number of times and use the results for training the models
+# on the server, or to test them (predict and compare to the truth). The
+# models are created first with 1-create-models.py
+
+import json
+import sys
+
+from lammps_stream_ml import campaign, columnar, lammps_log, launcher, run_cache
+from lammps_stream_ml import samplers
+from lammps_stream_ml.api import PooledClient, get_summary
+from lammps_stream_ml.fields import from_target, select_fields, to_target
+from lammps_stream_ml.metrics import StreamingMetrics
+
+
+def validate(args):
+    for dim, min_value, max_value in [
+        ["x", args.x_min, args.x_max],
+        ["y", args.y_min, args.y_max],
+        ["z", args.z_min, args.z_max],
+    ]:
+        if min_value < 1:
+            sys.exit(f"Min value for {dim} must be greater than or equal to 1")
+        if min_value >= max_value:
+            sys.exit(f"Max value for {dim} must be greater than or equal to min")
+        if max_value < 1:
+            sys.exit(
+                f"Max for {dim} also needs to be positive >1. Also, we should never get here."
+            )
+    for field in args.features.split(","):
+        if field not in lammps_log.fields:
+            sys.exit(f"{field} is not a known LAMMPS log field.")
+
+
+def get_sampler(args, cli):
+    """
+    Get the sampler to choose x, y, and z, within the ranges allowed for each.
+    """
+    space = launcher.get_space(args)
+
+    def score(candidates):
+        return cli.uncertainty(candidates, args.uncertainty_model)
+
+    try:
+        return samplers.get_sampler(
+            args.sampler,
+            space,
+            n=args.iters,
+            score=score,
+            seed=args.seed,
+            checkpoint=args.grid_checkpoint,
+        )
+    except ValueError as e:
+        sys.exit(str(e))
+
+
+def make_prediction(cli, args, test_x):
+    """
+    Make a prediction (cli can also be local models).
+    """
+    for model_name, pred in cli.predict_all(test_x).items():
+        pred = from_target(args, pred)
+        print(f"Model {model_name} predicts {pred}")
+        yield model_name, pred
+
+
+def format_value(value):
+    return "-" if value is None else f"{value:.3f}"
+
+
+def submit_train_result(cli, args, train_x, train_y):
+    """
+    Submit a training result
+
+    Each model predicts the result before it learns it, and we show the
+    rolling metrics of those predictions as we go.
+    """
+    print(f"Preparing to send LAMMPS data to {args.url}")
+
+    # Send this to the server to train each model
+    print(f"  Training with {train_x} to predict {train_y}")
+    result = cli.learn_all(train_x, to_target(args, train_y))
+    for model_name, error in result["errors"].items():
+        print(f"Issue with learn for {model_name}: {error}")
+    progress = [
+        f"{model_name} MAE {format_value(values['mae'])} "
+        f"R2 {format_value(values['r2'])}"
+        for model_name, values in result["metrics"].items()
+    ]
+    if progress:
+        print("     rolling => " + " | ".join(progress))
+
+
+def show_prequential(cli):
+    """
+    Show the rolling metrics of each model at the end of a train campaign.
+    """
+    result = cli.prequential()
+    if not result:
+        return
+    print(f"\n📈️ Test then train metrics (last {result['window']} samples)")
+    for model_name, record in result["models"].items():
+        values = record["metrics"] or {"mae": None, "rmse": None, "r2": None}
+        print(
+            f"  {model_name}: MAE {format_value(values['mae'])} "
+            f"RMSE {format_value(values['rmse'])} R2 {format_value(values['r2'])} "
+            f"({record['n']} samples)"
+        )
+
+
+def show_races(cli):
+    """
+    Show the leader of each race, and the variants still in it.
+    """
+    for model_name, race in cli.races().items():
+        print(
+            f"\n🏁️ {model_name}: {len(race['alive'])} of {race['variants']} "
+            f"variants after {race['rung']} rung(s), leader {race['leader']}"
+        )
+        for name, error in sorted(
+            race["alive"].items(), key=lambda item: (item[1] is None, item[1])
+        ):
+            print(f"  {name}: MAE {format_value(error)} in this rung")
+
+
+def show_metrics(cli, streaming):
+    """
+    Show metrics (and return simple view for each model)
+    """
+    results = {}
+    summary = get_summary(cli)
+
+    # The metrics were calculated as we went, we just need to show them
+    for model_name in streaming.models:
+        values = streaming.get(model_name)
+        print(f"\n⭐️ Performance for: {model_name}")
+        print(f"          R Squared Error: {values['r_squared']}")
+        print(f"       Mean Squared Error: {values['mean_squared_error']}")
+        print(f"      Mean Absolute Error: {values['mean_absolute_error']}")
+        print(f"  Root Mean Squared Error: {values['root_mean_squared_error']}")
+
+        results[model_name] = {
+            **values,
+            **summary.get(model_name, {}),
+            "model_name": model_name,
+        }
+    return results
+
+
+def write_output(filename, result):
+    """
+    Write output to json file
+    """
+    with open(filename, "w") as fd:
+        fd.write(json.dumps(result, indent=4))
+
+
+def main(args, parser, extra):
+    # Sanity check values
+    validate(args)
+    if args.resume and not args.checkpoint:
+        sys.exit("To --resume a campaign, please provide the --checkpoint.")
+    out = getattr(args, "out", None)
+    if out and columnar.get_format(out) not in columnar.formats:
+        sys.exit(f"--out must be one of {', '.join(columnar.formats)}")
+
+    # Find the software we need to run lammps
+    executables = launcher.find_executables(args)
+
+    print(f"Preparing to run lammps and {args.command} models with {args.launcher}")
+
+    # Connect to the server running here, keeping connections alive between runs
+    cli = PooledClient(args.url, pool_size=args.pool_size, timeout=args.timeout)
+
+    # Do a test to the client
+    res = cli.info()
+    print(json.dumps(res, indent=4))
+
+    # The sampler chooses x, y, and z for each run
+    sampler = get_sampler(args, cli)
+
+    # When the features are x, y, and z the server can predict from a table
+    space = launcher.get_space(args)
+    if args.command == "predict" and set(args.features.split(",")) == set(space):
+        cli.declare_grid(space)
+
+    # If we are predicting, we will save true / predicted values
+    # https://riverml.xyz/latest/api/metrics/Accuracy/
+    # The campaign keeps actual and predictions (namespaced by model), and
+    # can checkpoint them (and the sampler) after each run to resume later
+    header = {
+        "command": args.command,
+        "space": space,
+        "sampler": args.sampler,
+        "features": args.features,
+        "target": args.target,
+        "log_target": args.log_target,
+    }
+
+    # Metrics are updated as we go, and a table output is appended to as we go.
+    # We only keep every prediction in memory to write --out json at the end
+    streaming = None
+    listeners = []
+    predictor = cli
+    if args.command == "predict":
+        streaming = StreamingMetrics()
+        listeners.append(streaming)
+
+        # Linear models can predict here, with weights from the server
+        if args.local:
+            from lammps_stream_ml.local import LocalModels
+
+            predictor = LocalModels(cli, sync=args.local_sync)
+    try:
+        writer = columnar.get_writer(out) if out else None
+        if writer is not None:
+            listeners.append(writer)
+        results = campaign.Campaign(
+            header,
+            args.checkpoint,
+            keep=out is not None and writer is None,
+            listeners=listeners,
+        )
+        results.start(resume=args.resume)
+    except ValueError as e:
+        sys.exit(str(e))
+    if results.sampler is not None:
+        sampler.set_state(results.sampler)
+
+    # Results for runs we have done before can come from the cache
+    cache = None
+    if args.cache:
+        cache = run_cache.RunCache(args.cache)
+        if not args.container_digest and args.container:
+            args.container_digest = cache.container_digest(args.container)
+
+    runs = launcher.run_lammps(
+        args, sampler, executables, cache, start=results.iteration
+    )
+    for i, fields in runs:
+        features, target = select_fields(args, fields)
+        if features is None:
+            continue
+
+        # If we are training, we are done here!
+        if args.command == "train":
+            submit_train_result(cli, args, features, target)
+            results.add(i, features, target, sampler=sampler.get_state())
+        else:
+            # Save the true value, dimensions (features) and predictions
+            predictions = dict(make_prediction(predictor, args, features))
+            results.add(i, features, target, predictions, sampler.get_state())
+            streaming.show_progress()
+
+    # When we are finished running, if we are predicting, give final results
+    if args.command == "train":
+        show_prequential(cli)
+        show_races(cli)
+    if args.command == "predict":
+        y_true, y_pred, dims = results.y_true, results.y_pred, results.dims
+        summary = show_metrics(cli, streaming)
+        if writer is not None:
+            writer.close()
+            write_output(columnar.get_summary_file(out), summary)
+        elif out is not None:
+            summary.update({"dims": dims, "y_pred": y_pred, "y_true": y_true})
+            write_output(out, summary)
+
+    # Where did the time go?
+    cli.show_latency()
+    if predictor is not cli:
+        predictor.show()
+    if cache is not None:
+        cache.show()
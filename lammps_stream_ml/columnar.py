@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+# Write and read the results of a predict campaign as a table, with one row
+# per (run, model): the iteration, model, features, actual and predicted value.
+# Parquet (with pyarrow) is columnar and compressed, so large campaigns are
+# quick to write and a reader can load only the columns it needs. CSV needs
+# nothing extra. Both are appended to as the campaign runs. The json output
+# (the default) can be read the same way, so plotting works with any of them.
+
+import abc
+import csv
+import json
+import os
+
+# Rows to buffer before we write a parquet row group
+row_group_size = 1000
+
+formats = [".json", ".parquet", ".csv"]
+
+
+def get_format(filename):
+    return os.path.splitext(filename)[-1].lower()
+
+
+def get_summary_file(filename):
+    """
+    Tables don't have room for the summary (metrics, stats) of each model,
+    so we write it next to the table.
+    """
+    return os.path.splitext(filename)[0] + "-summary.json"
+
+
+class TableWriter(abc.ABC):
+    """
+    Append rows for each run (a campaign record with predictions).
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.columns = None
+
+    def get_rows(self, record):
+        features = record["features"]
+        if self.columns is None:
+            self.columns = ["iteration", "model", *features, "y_true", "y_pred"]
+        for model_name, pred in record["predictions"].items():
+            yield [
+                record["iteration"],
+                model_name,
+                *features.values(),
+                record["target"],
+                pred,
+            ]
+
+    @abc.abstractmethod
+    def add(self, record):
+        pass
+
+    def close(self):
+        pass
+
+
+class CsvWriter(TableWriter):
+    """
+    Append rows to a csv file, one line per row, flushed after each run.
+    """
+
+    def __init__(self, filename):
+        super().__init__(filename)
+        self.fd = open(filename, "w", newline="")
+        self.writer = csv.writer(self.fd)
+
+    def add(self, record):
+        header = self.columns is None
+        rows = list(self.get_rows(record))
+        if header:
+            self.writer.writerow(self.columns)
+        self.writer.writerows(rows)
+        self.fd.flush()
+
+    def close(self):
+        self.fd.close()
+
+
+class ParquetWriter(TableWriter):
+    """
+    Append rows to a parquet file, in row groups.
+
+    Note that the parquet footer is written on close, so an interrupted
+    campaign should be resumed from its checkpoint (which writes it again).
+    """
+
+    def __init__(self, filename):
+        super().__init__(filename)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Writing parquet requires pyarrow: pip install pyarrow")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.writer = None
+        self.rows = []
+
+    def add(self, record):
+        self.rows += list(self.get_rows(record))
+        if len(self.rows) >= row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        table = self.pa.Table.from_pydict(
+            {name: list(values) for name, values in zip(self.columns, zip(*self.rows))}
+        )
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.filename, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+def get_writer(filename):
+    """
+    Get a table writer for a filename, or None for json (written at the end).
+    """
+    fmt = get_format(filename)
+    if fmt == ".parquet":
+        return ParquetWriter(filename)
+    if fmt == ".csv":
+        return CsvWriter(filename)
+    return None
+
+
+def iter_batches(filename, columns=None, batch_size=10000):
+    """
+    Read a results file in batches, each a dictionary of column to values.
+
+    Only the columns asked for are loaded (for parquet, only those are read
+    from disk). The json results are converted to the same rows.
+    """
+    fmt = get_format(filename)
+    if fmt == ".parquet":
+        import pyarrow.parquet
+
+        table = pyarrow.parquet.ParquetFile(filename)
+        for batch in table.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pydict()
+
+    elif fmt == ".csv":
+        with open(filename, newline="") as fd:
+            reader = csv.reader(fd)
+            header = next(reader, None)
+            if header is None:
+                return
+            index = [header.index(name) for name in columns or header]
+            names = [header[i] for i in index]
+            batch = {name: [] for name in names}
+            count = 0
+            for row in reader:
+                for name, i in zip(names, index):
+                    batch[name].append(parse_value(row[i]))
+                count += 1
+                if count == batch_size:
+                    yield batch
+                    batch = {name: [] for name in names}
+                    count = 0
+            if count:
+                yield batch
+
+    else:
+        with open(filename, "r") as fd:
+            results = json.loads(fd.read())
+        batch = {}
+        for model_name, preds in results["y_pred"].items():
+            for i, (dims, y_true, pred) in enumerate(
+                zip(results["dims"], results["y_true"], preds)
+            ):
+                row = {
+                    "iteration": i,
+                    "model": model_name,
+                    **dims,
+                    "y_true": y_true,
+                    "y_pred": pred,
+                }
+                for name in columns or row:
+                    batch.setdefault(name, []).append(row.get(name))
+        if batch:
+            yield batch
+
+
+def iter_runs(filename):
+    """
+    Recorded runs (features and actual value) in a results file, once each.
+
+    A table has a row for every model, so we keep the first row of a run.
+    """
+    if get_format(filename) == ".json":
+        with open(filename, "r") as fd:
+            results = json.loads(fd.read())
+        yield from zip(results["dims"], results["y_true"])
+        return
+
+    seen = set()
+    columns = ["iteration", "model", "y_true", "y_pred"]
+    for batch in iter_batches(filename):
+        names = [x for x in batch if x not in columns]
+        for i, iteration in enumerate(batch["iteration"]):
+            if iteration in seen:
+                continue
+            seen.add(iteration)
+            yield {name: batch[name][i] for name in names}, batch["y_true"][i]
+
+
+def parse_value(value):
+    """
+    Values in csv are strings, and we want numbers back (the model is a string).
+    """
+    for kind in int, float:
+        try:
+            return kind(value)
+        except ValueError:
+            continue
+    return None if value == "" else value
+
+
+def load_summary(filename):
+    """
+    The summary (metrics, stats, model) for each model in a results file.
+    """
+    if get_format(filename) != ".json":
+        filename = get_summary_file(filename)
+        if not os.path.exists(filename):
+            return {}
+    with open(filename, "r") as fd:
+        results = json.loads(fd.read())
+    return {
+        key: value
+        for key, value in results.items()
+        if key not in ["dims", "y_pred", "y_true"]
+    }
@@ -0,0 +1,66 @@
+# Choose the features and target for the models from the fields of a LAMMPS
+# log (or runs we recorded), and transform the target to what they learn.
+
+import math
+import os
+
+from . import campaign, run_cache
+
+
+def select_fields(args, fields):
+    """
+    Select the features and target for a run from the fields of its log.
+
+    If the log is missing any of them (e.g., no timing breakdown) we return
+    None for both, and the run cannot be used.
+    """
+    features = {name: fields.get(name) for name in args.features.split(",")}
+    target = fields.get(args.target)
+    missing = [name for name, value in features.items() if value is None]
+    if target is None:
+        missing.append(args.target)
+    if missing:
+        print(f"Warning, the LAMMPS log is missing {', '.join(missing)}, skipping")
+        return None, None
+    return features, target
+
+
+def to_target(args, value):
+    """
+    Transform a target value to what the models learn.
+    """
+    return math.log1p(value) if args.log_target else value
+
+
+def from_target(args, value):
+    """
+    Transform a model prediction back to the units of the target.
+    """
+    if args.log_target and value is not None:
+        return math.expm1(value)
+    return value
+
+
+def iter_recorded(args, filename):
+    """
+    Recorded runs (features and target) with the features we learn from.
+
+    A cache directory has every field from the log, so we select --features
+    and --target. Recorded results already have a target, and we select the
+    --features from theirs.
+    """
+    if os.path.isdir(filename):
+        cache = run_cache.RunCache(filename)
+        runs = (select_fields(args, fields) for fields in cache.iter_fields())
+    else:
+        names = args.features.split(",")
+        runs = (
+            ({name: features.get(name) for name in names}, target)
+            for features, target in campaign.iter_runs(filename)
+        )
+    for features, target in runs:
+        if features is None or target is None:
+            continue
+        if any(value is None for value in features.values()):
+            continue
+        yield features, target
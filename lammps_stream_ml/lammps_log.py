@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+# Parse LAMMPS output into summary fields that can be used as features or
+# targets for the models. The screen output and the file written with -log
+# have the same content, so the same parser is fed either one line at a time.
+# Run directly to see what we find in a log:
+# python3 -m lammps_stream_ml.lammps_log /tmp/lammps.log
+
+import collections
+import json
+import sys
+
+# Fields that we know how to provide. Timing breakdown sections are
+# percentages of total time, and performance units are named with _per_
+# e.g., ns/day is ns_per_day. x, y, z, nodes and the elapsed time of the
+# job (measured with a monotonic clock) are added by the runner.
+fields = [
+    "x",
+    "y",
+    "z",
+    "nodes",
+    "elapsed",
+    "ranks",
+    "threads",
+    "atoms",
+    "steps",
+    "loop_time",
+    "wall_time",
+    "ns_per_day",
+    "hours_per_ns",
+    "timesteps_per_s",
+    "pair_pct",
+    "bond_pct",
+    "kspace_pct",
+    "neigh_pct",
+    "comm_pct",
+    "output_pct",
+    "modify_pct",
+    "other_pct",
+]
+
+
+def parse_time(line):
+    line = line.rsplit(" ", 1)[-1]
+    hours, minutes, seconds = line.split(":")
+    return (int(hours) * 60 * 60) + (int(minutes) * 60) + int(seconds)
+
+
+class LammpsLog:
+    """
+    Incremental parser for LAMMPS output, fed one line at a time.
+
+    We don't hold on to the full output, only a bounded tail of lines that
+    we can show if the run fails. As lines come in we pull out the thermo
+    table, the Loop time and Performance summaries, the MPI task timing
+    breakdown and the total wall time.
+    """
+
+    def __init__(self, tail=50):
+        self.tail = collections.deque(maxlen=tail)
+        self.wall_time = None
+        self.loop = {}
+        self.performance = {}
+        self.breakdown = {}
+        self.tasks = {}
+        self.thermo_columns = []
+        self.thermo = []
+        self.in_thermo = False
+        self.in_breakdown = False
+
+    @classmethod
+    def from_file(cls, filename, tail=50):
+        log = cls(tail=tail)
+        with open(filename, "r") as fd:
+            for line in fd:
+                log.feed(line)
+        return log
+
+    def feed(self, line):
+        line = line.rstrip("\n")
+        self.tail.append(line)
+        words = line.split()
+        if not words:
+            self.in_breakdown = False
+            return
+
+        # Step Temp E_pair TotEng Press (the columns depend on the input)
+        if words[0] == "Step":
+            self.thermo_columns = words
+            self.in_thermo = True
+
+        # Loop time of 2.72 on 48 procs for 100 steps with 2048 atoms
+        elif line.startswith("Loop time of"):
+            self.in_thermo = False
+            self.loop = {
+                "seconds": float(words[3]),
+                "procs": int(words[5]),
+                "steps": int(words[8]),
+                "atoms": int(words[11]),
+            }
+
+        # Performance: 0.318 ns/day, 75.553 hours/ns, 36.767 timesteps/s
+        elif line.startswith("Performance:"):
+            for item in line.split(":", 1)[-1].split(","):
+                value, _, unit = item.strip().partition(" ")
+                try:
+                    self.performance[unit] = float(value)
+                except ValueError:
+                    continue
+
+        # 99.2% CPU use with 48 MPI tasks x 1 OpenMP threads
+        elif "MPI tasks x" in line:
+            self.tasks = {"ranks": int(words[4]), "threads": int(words[8])}
+
+        # Section |  min time  |  avg time  |  max time  |%varavg| %total
+        elif line.startswith("MPI task timing breakdown"):
+            self.in_breakdown = True
+
+        # Pair    | 2.1011     | 2.1248     | 2.1488     |   1.0 | 78.13
+        elif self.in_breakdown and "|" in line:
+            cells = [cell.strip() for cell in line.split("|")]
+            try:
+                self.breakdown[cells[0].lower()] = float(cells[-1])
+            except ValueError:
+                pass
+
+        elif line.startswith("Total wall time"):
+            self.wall_time = parse_time(line)
+
+        elif self.in_thermo and len(words) == len(self.thermo_columns):
+            try:
+                self.thermo.append([float(word) for word in words])
+            except ValueError:
+                self.in_thermo = False
+
+    def fields(self):
+        """
+        Flatten what we found into named fields (see fields at the top)
+        """
+        result = {
+            "ranks": self.tasks.get("ranks", self.loop.get("procs")),
+            "threads": self.tasks.get("threads"),
+            "atoms": self.loop.get("atoms"),
+            "steps": self.loop.get("steps"),
+            "loop_time": self.loop.get("seconds"),
+            "wall_time": self.wall_time,
+        }
+        for unit, value in self.performance.items():
+            result[unit.replace("/", "_per_").replace("-", "_")] = value
+        for section, percent in self.breakdown.items():
+            result[f"{section}_pct"] = percent
+        return result
+
+    def show_tail(self):
+        print("\n".join(self.tail))
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit("Please provide one or more LAMMPS log files to parse.")
+    for filename in sys.argv[1:]:
+        log = LammpsLog.from_file(filename)
+        print(json.dumps({"log": filename, **log.fields()}, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# Run LAMMPS for each point a sampler chooses, and parse what it reports.
+# With flux (on the host) each run is a flux job that runs LAMMPS in the
+# Singularity container. With mpirun we are already in the container (or
+# anywhere lmp is installed) and run it directly.
+
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from . import lammps_log
+
+launchers = ["flux", "mpirun"]
+
+
+def get_space(args):
+    """
+    The ranges allowed for each of x, y, and z.
+
+    If we choose the nodes or processes for each run, they are in the space
+    too, and otherwise every run uses --nodes and --np.
+    """
+    space = {
+        "x": list(range(args.x_min, args.x_max + 1)),
+        "y": list(range(args.y_min, args.y_max + 1)),
+        "z": list(range(args.z_min, args.z_max + 1)),
+    }
+    if args.nodes_choices:
+        space["nodes"] = args.nodes_choices
+    if args.np_choices:
+        space["np"] = args.np_choices
+    return space
+
+
+def get_resources(args, point):
+    """
+    The nodes and processes for a point, and the MPI ranks that makes.
+
+    flux runs --np tasks in total, and mpirun runs --np on each node.
+    """
+    nodes = point.get("nodes", args.nodes)
+    np = point.get("np", args.np)
+    ranks = np if args.launcher == "flux" else nodes * np
+    return nodes, np, ranks
+
+
+def get_signature(args, point):
+    """
+    Everything that changes the result of a run, to find it in the cache.
+
+    The launcher decides how many ranks the same nodes and np make, so runs
+    with flux and mpirun are cached apart.
+    """
+    nodes, np, ranks = get_resources(args, point)
+    return {
+        "launcher": args.launcher,
+        "ranks": ranks,
+        "inputs": args.inputs,
+        "workdir": args.workdir,
+        "x": point["x"],
+        "y": point["y"],
+        "z": point["z"],
+        "nodes": nodes,
+        "np": np,
+        "container": args.container_digest,
+    }
+
+
+def find_executables(args):
+    """
+    Find the software we need for the launcher, and exit if we cannot.
+    """
+    names = ["flux", "singularity"] if args.launcher == "flux" else ["mpirun", "lmp"]
+    found = {name: shutil.which(name) for name in names}
+    missing = [name for name, path in found.items() if not path]
+    if missing:
+        sys.exit(f"Cannot find {' or '.join(missing)} executable.")
+    if args.launcher == "flux" and not args.container:
+        sys.exit("Running with flux requires the --container with lammps.")
+    return found
+
+
+def get_command(args, executables, point, submit=False, log=None, time_limit=None):
+    """
+    The command to run LAMMPS for a point (x, y, z), as parts to print.
+
+    With submit, flux submits the job to its queue and does not wait for it
+    (jobs that run at the same time should each have their own log). Flux
+    kills a job that runs longer than the time limit (seconds).
+    """
+    # This is where lammps is installed in the container, this should not change
+    lmp = executables.get("lmp", "/usr/bin/lmp")
+    nodes, np, _ = get_resources(args, point)
+    lmp_cmd = [
+        lmp,
+        "-v",
+        "x",
+        str(point["x"]),
+        "-v",
+        "y",
+        str(point["y"]),
+        "-v",
+        "z",
+        str(point["z"]),
+        "-log",
+        log or args.log,
+        "-in",
+    ] + args.inputs.split(" ")
+
+    if args.launcher == "mpirun":
+        mpirun_cmd = [
+            executables["mpirun"],
+            "-N",
+            str(nodes),
+            "--ppn",
+            str(np),
+        ]
+        return {"mpirun": mpirun_cmd + lmp_cmd}
+
+    # flux run -N 6 --ntasks 48 -c 1 -o cpu-affinity=per-task singularity exec --pwd /opt/lammps/examples/reaxff/HNS $container /usr/bin/lmp -v x 32 -v y 8 -v z 16 -in in.reaxc.hns
+    # Separate into flux command and singularity command for printing
+    flux_cmd = [
+        executables["flux"],
+        "submit" if submit else "run",
+        "-N",
+        str(nodes),
+        "--ntasks",
+        str(np),
+        # These aren't exposed as options because we pretty much always want them
+        "-c",
+        "1",
+        "-o",
+        "cpu-affinity=per-task",
+    ]
+    if time_limit is not None:
+        flux_cmd += ["-t", f"{time_limit}s"]
+    singularity_cmd = [
+        executables["singularity"],
+        "exec",
+        "--pwd",
+        args.workdir,
+        args.container,
+    ]
+    return {"flux": flux_cmd, "singularity": singularity_cmd + lmp_cmd}
+
+
+def run_lammps(args, sampler, executables, cache=None, start=0):
+    """
+    Shared function to run lammps for train or testing.
+
+    We return (yield) the iteration and the fields parsed from the log as we run
+    (x, y, and z are fields too). If we resume a campaign we start part way.
+    """
+    # With mpirun we need to be in this PWD with the experiment data
+    cwd = args.workdir if args.launcher == "mpirun" else None
+
+    for i in range(start, args.iters):
+        point = sampler.sample()
+        x, y, z = point["x"], point["y"], point["z"]
+        nodes, np, _ = get_resources(args, point)
+        print(
+            f"\n🎄️ Running iteration {i} with chosen x: {x} y: {y} z: {z} "
+            f"(nodes: {nodes} np: {np})"
+        )
+
+        # We have run this before, and don't need to again
+        signature = get_signature(args, point)
+        if cache is not None and args.cache_mode == "use":
+            cached = cache.get(signature)
+            if cached is not None:
+                fields = cached["fields"]
+                print(f"       cached => Lammps run took {fields['elapsed']:.3f} seconds")
+                yield i, fields
+                continue
+
+        cmd = []
+        for name, part in get_command(args, executables, point).items():
+            print(f"{name:>13} => " + " ".join(part))
+            cmd += part
+
+        # LAMMPS only reports wall time to the second, so we also time the job
+        # ourselves with a monotonic clock (this includes flux and singularity)
+        started = time.time()
+        began = time.perf_counter()
+        p = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, cwd=cwd
+        )
+
+        # Parse the output as it streams, until the run is done.
+        # Errors are interleaved with output, so the tail shows them in context
+        output = lammps_log.LammpsLog()
+        for line in p.stdout:
+            output.feed(line)
+        p.wait()
+        elapsed = time.perf_counter() - began
+
+        # If the screen output is turned off (-screen none) the log has the same content
+        log = os.path.join(cwd or "", args.log)
+        if (
+            output.wall_time is None
+            and os.path.exists(log)
+            and os.stat(log).st_mtime >= started
+        ):
+            output = lammps_log.LammpsLog.from_file(log)
+
+        # Note this is currently written to run experiments, meaning we use all resources available
+        # for each run, and can just wait for the run and parse output. If you want to use flux submit,
+        # you can instead write each to a log file, read the log file, and parse the same.
+        if p.returncode != 0 or output.wall_time is None:
+            print(f"Warning, there was an issue with iteration {i}")
+            output.show_tail()
+            continue
+
+        fields = output.fields()
+        fields.update(
+            {"x": x, "y": y, "z": z, "nodes": nodes, "elapsed": elapsed}
+        )
+        print(
+            f"       result => Lammps run took {elapsed:.3f} seconds "
+            f"(loop time {fields['loop_time']}, wall time {output.wall_time})"
+        )
+        if cache is not None:
+            cache.set(signature, fields, output.tail)
+        yield i, fields
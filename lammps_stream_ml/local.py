@@ -0,0 +1,111 @@
+# Predict with linear models on the client. The server exports the scaler
+# statistics and weights of a linear model, and we keep them until the model
+# changes: every so often we ask again with the version we have (ETag), and
+# the server answers 304 Not Modified unless there is a new one. Models the
+# server cannot export are still predicted on the server.
+
+import time
+
+import numpy
+
+
+class LocalModel:
+    """
+    A linear model (with an optional StandardScaler in front) from an export.
+    """
+
+    def __init__(self, exported):
+        self.version = exported["version"]
+        self.kind = exported["kind"]
+        self.features = exported["features"]
+        self.index = {name: i for i, name in enumerate(self.features)}
+        self.weights = numpy.array(exported["weights"], dtype=float)
+        self.intercept = exported["intercept"]
+        self.means = self.scales = None
+        if exported["means"] is not None:
+            self.means = numpy.array(exported["means"], dtype=float)
+        if exported["vars"] is not None:
+            # Like the StandardScaler, a feature with no variance scales to 0
+            variance = numpy.array(exported["vars"], dtype=float)
+            self.scales = numpy.zeros(len(variance))
+            numpy.divide(1, numpy.sqrt(variance), out=self.scales, where=variance > 0)
+
+    def to_array(self, X):
+        """
+        Features of each sample as a row, and which of them each sample has.
+
+        Features the model has not seen have no weight, so we leave them out.
+        """
+        values = numpy.zeros((len(X), len(self.features)))
+        present = numpy.zeros(values.shape, dtype=bool)
+        for row, x in enumerate(X):
+            for name, value in x.items():
+                column = self.index.get(name)
+                if column is not None:
+                    values[row, column] = value
+                    present[row, column] = True
+        return values, present
+
+    def predict_many(self, X):
+        values, present = self.to_array(X)
+        if self.means is not None:
+            values = values - self.means
+        if self.scales is not None:
+            values = values * self.scales
+        # A sample without a feature does not add to the prediction
+        values[~present] = 0.0
+        return values @ self.weights + self.intercept
+
+    def predict_one(self, x):
+        return float(self.predict_many([x])[0])
+
+
+class LocalModels:
+    """
+    Predictions from every model on the server, local where we can.
+
+    We ask for the list of models (and new versions of exports) at most
+    every sync seconds, so between syncs a prediction is not a request.
+    A model the server cannot export is not asked for again.
+    """
+
+    def __init__(self, cli, sync=30):
+        self.cli = cli
+        self.sync = sync
+        self.synced = None
+        self.names = []
+        self.models = {}
+        self.remote = set()
+
+    def refresh(self):
+        """
+        Get the model names, and new exports for the models that changed.
+        """
+        self.names = self.cli.models()["models"]
+        for model_name in self.names:
+            if model_name in self.remote:
+                continue
+            current = self.models.get(model_name)
+            version = current.version if current else None
+            exported = self.cli.get_export(model_name, version)
+            if exported is None:
+                self.models.pop(model_name, None)
+                self.remote.add(model_name)
+            elif exported["version"] != version:
+                self.models[model_name] = LocalModel(exported)
+        self.models = {n: m for n, m in self.models.items() if n in self.names}
+        self.synced = time.monotonic()
+
+    def predict_all(self, x):
+        if self.synced is None or time.monotonic() - self.synced > self.sync:
+            self.refresh()
+        remote = [name for name in self.names if name not in self.models]
+        predictions = self.cli.predict_all(x, models=remote) if remote else {}
+        for model_name, model in self.models.items():
+            predictions[model_name] = model.predict_one(x)
+        return {name: predictions.get(name) for name in self.names}
+
+    def show(self):
+        print(f"\n🏠️ Predicting locally with {len(self.models)} model(s)")
+        for model_name, model in self.models.items():
+            print(f"  {model_name} ({model.kind}) version {model.version}")
@@ -0,0 +1,61 @@
+# Metrics for each model, updated as each prediction arrives.
+# River takes about a second to import, so we only do it when metrics are used.
+
+
+class StreamingMetrics:
+    """
+    Metrics for each model, updated as each prediction arrives.
+
+    We only keep the running metrics (not the predictions), so memory does
+    not grow with the campaign, and the final report is ready immediately.
+    """
+
+    def __init__(self):
+        from river import metrics
+
+        self.metrics = metrics
+        self.models = {}
+        self.count = 0
+
+    def add(self, record):
+        """
+        Add a completed run from the campaign.
+        """
+        self.update(record["target"], record["predictions"])
+
+    def update(self, y_true, predictions):
+        self.count += 1
+        for model_name, pred in predictions.items():
+            if pred is None:
+                continue
+            if model_name not in self.models:
+                metrics = self.metrics
+                self.models[model_name] = {
+                    # Mean squared error
+                    "mean_squared_error": metrics.MSE(),
+                    # Root mean squared error
+                    "root_mean_squared_error": metrics.RMSE(),
+                    # Mean absolute error
+                    "mean_absolute_error": metrics.MAE(),
+                    # Coefficient of determination () score - r squared
+                    # proportion of the variance in the dependent variable that is predictable from the independent variable(s)
+                    "r_squared": metrics.R2(),
+                }
+            for metric in self.models[model_name].values():
+                metric.update(y_true, pred)
+
+    def get(self, model_name):
+        return {name: metric.get() for name, metric in self.models[model_name].items()}
+
+    def show_progress(self):
+        """
+        One line with running R squared and RMSE for each model.
+        """
+        progress = []
+        for model_name in self.models:
+            values = self.get(model_name)
+            progress.append(
+                f"{model_name} R2 {values['r_squared']:.3f} "
+                f"RMSE {values['root_mean_squared_error']:.3f}"
+            )
+        print(f"     progress => [{self.count}] " + " | ".join(progress))
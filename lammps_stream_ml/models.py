@@ -0,0 +1,206 @@
+# The models we create on the server, different kinds of regressions to
+# predict LAMMPS run times. Before we upload them, they can be trained on
+# runs we already recorded, so a new server starts with useful models.
+
+import math
+
+import numpy
+from river import (
+    compose,
+    feature_extraction,
+    forest,
+    linear_model,
+    neighbors,
+    optim,
+    preprocessing,
+    tree,
+)
+
+from lammps_stream_ml.race import ModelRace
+
+# Quantiles of the run time we create models for (e.g., p95 for a time limit)
+quantiles = [0.5, 0.9, 0.95, 0.99]
+
+
+def get_physics_features(x):
+    """
+    Features from how a LAMMPS run scales, from x, y, z, and the ranks.
+
+    x, y, and z replicate the box, so the atoms grow with their product, and
+    each rank has its share of them (work). Ranks exchange the atoms at the
+    surface of their part of the box (communication), and collectives take
+    longer with the log of the ranks. Nodes and ranks are optional features
+    (1 if the campaign did not vary them). x is a dict for one run, or a
+    DataFrame of runs (e.g., a grid for predict_many), so we only use
+    operations that work on both, and return the same kind.
+    """
+    cells = x["x"] * x["y"] * x["z"]
+    ranks = x["ranks"] if "ranks" in x else 1
+    work = cells / ranks
+    features = {
+        "cells": cells,
+        "work_per_rank": work,
+        "surface_per_rank": work ** (2 / 3),
+        "log_ranks": numpy.log(ranks),
+        "nodes": x["nodes"] if "nodes" in x else 1,
+    }
+    if hasattr(x, "assign"):
+        return x.assign(**features)[list(features)]
+    return features
+
+
+def get_models():
+    """
+    New (untrained) models to upload, by a name for the kind of model.
+
+    The server unpickles the physics regression with get_physics_features
+    from this module, which it has (the server image is this repository).
+    """
+    return {
+        "linear-regression": preprocessing.StandardScaler()
+        | linear_model.LinearRegression(intercept_lr=0.1),
+        "physics-regression": compose.FuncTransformer(get_physics_features)
+        | preprocessing.StandardScaler()
+        | linear_model.LinearRegression(intercept_lr=0.1),
+        # https://riverml.xyz/latest/api/linear-model/BayesianLinearRegression/
+        "bayesian-linear-regression": linear_model.BayesianLinearRegression(),
+        # That's kind of cool, although I'm not sure I like PA people, not sure how I feel about ML models :)
+        # https://www.geeksforgeeks.org/passive-aggressive-classifiers/
+        "pa-regression": linear_model.PARegressor(
+            C=0.01, mode=2, eps=0.1, learn_intercept=False
+        ),
+    }
+
+
+def get_quantile_models():
+    """
+    Linear regressions for quantiles of the run time, by name.
+
+    The pinball loss moves a prediction at most the learning rate for each
+    run, so the models learn log(1 + run time) to get there in tens of runs
+    and not thousands. A quantile is the same after a monotonic transform,
+    so this also works when the target is already log transformed.
+    """
+    return {
+        f"quantile-p{round(q * 100)}-regression": compose.TargetTransformRegressor(
+            preprocessing.StandardScaler()
+            | linear_model.LinearRegression(
+                optimizer=optim.SGD(0.05),
+                intercept_lr=0.5,
+                loss=optim.losses.Quantile(q),
+            ),
+            func=math.log1p,
+            inverse_func=math.expm1,
+        )
+        for q in quantiles
+    }
+
+
+def get_race_variants():
+    """
+    Variants of the linear and PA regressions for a race, by name.
+
+    We vary the learning rate (or C), the scaler, and the features (x, y, and
+    z, or those from how a run scales).
+    """
+    scalers = {
+        "standard": preprocessing.StandardScaler,
+        "maxabs": preprocessing.MaxAbsScaler,
+        "minmax": preprocessing.MinMaxScaler,
+    }
+    regressions = {
+        **{
+            f"linear-lr{lr}": lambda lr=lr: linear_model.LinearRegression(
+                optimizer=optim.SGD(lr), intercept_lr=0.1
+            )
+            for lr in [0.001, 0.005, 0.01, 0.05, 0.1]
+        },
+        **{
+            f"pa-c{C}": lambda C=C: linear_model.PARegressor(C=C, mode=2, eps=0.1)
+            for C in [0.001, 0.01, 0.1, 1.0]
+        },
+    }
+    variants = {}
+    for features in ["xyz", "physics"]:
+        for scaler_name, scaler in scalers.items():
+            for name, regression in regressions.items():
+                model = scaler() | regression()
+                if features == "physics":
+                    model = compose.FuncTransformer(get_physics_features) | model
+                variants[f"{features}-{scaler_name}-{name}"] = model
+    return variants
+
+
+def get_race(rung=10):
+    """
+    A race of the variants, which the server keeps as one model.
+    """
+    return {"race-regression": ModelRace(get_race_variants(), rung=rung)}
+
+
+def get_candidates(seed=42):
+    """
+    New models we might want to create, to compare with the ones we have.
+    """
+    return {
+        # Run time grows with the product of x, y, and z, which is not linear
+        "polynomial-regression": preprocessing.StandardScaler()
+        | feature_extraction.PolynomialExtender(degree=2, include_bias=False)
+        | linear_model.LinearRegression(intercept_lr=0.1),
+        "knn-regression": preprocessing.StandardScaler()
+        | neighbors.KNNRegressor(n_neighbors=5),
+        "hoeffding-tree-regression": tree.HoeffdingAdaptiveTreeRegressor(seed=seed),
+        "random-forest-regression": forest.ARFRegressor(n_models=5, seed=seed),
+    }
+
+
+def get_kinds(seed=42):
+    """
+    A new model of every kind we know, by name (e.g., to rebuild one).
+    """
+    return {
+        **get_models(),
+        **get_quantile_models(),
+        **get_race(),
+        **get_candidates(seed=seed),
+    }
+
+
+def can_learn_many(model):
+    """
+    Can the model (every step, if a pipeline) learn from a batch?
+
+    A FuncTransformer has learn_many, but our functions take one sample.
+    """
+    steps = getattr(model, "steps", {"model": model}).values()
+    return all(
+        hasattr(step, "learn_many") and not isinstance(step, compose.FuncTransformer)
+        for step in steps
+    )
+
+
+def learn(model, runs, batch_size=1):
+    """
+    Train a model on recorded runs (features and target), in order.
+
+    A batch size of 1 is the same as the server learning each run as it
+    comes. With a larger batch we use learn_many (with pandas) if the model
+    supports it. This is quicker for a long history, but for gradient
+    models (e.g., linear regression) a batch is a single step.
+    """
+    if batch_size <= 1 or not can_learn_many(model):
+        for x, y in runs:
+            model.learn_one(x, y)
+        return model
+
+    try:
+        import pandas
+    except ImportError:
+        raise ValueError("Learning in batches requires pandas: pip install pandas")
+    for start in range(0, len(runs), batch_size):
+        batch = runs[start : start + batch_size]
+        model.learn_many(
+            pandas.DataFrame([x for x, _ in batch]),
+            pandas.Series([y for _, y in batch]),
+        )
+    return model
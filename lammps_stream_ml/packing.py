@@ -0,0 +1,53 @@
+# Pack LAMMPS jobs onto the nodes of a cluster so the batch finishes as soon
+# as possible (the makespan). We use longest processing time first (LPT):
+# jobs are sorted by predicted run time (times nodes, so wide jobs go first),
+# and each starts on the nodes that are free first. When every job needs the
+# same number of nodes this is the classic LPT, within 4/3 of the optimum.
+
+import heapq
+
+
+def list_schedule(jobs, total_nodes, runtime):
+    """
+    Start each job, in order, on the nodes that are free first.
+
+    Each job is a dictionary with the nodes it needs, and runtime(job) is how
+    long it runs. We return the jobs with a start, end, and the node indices
+    (hosts) it runs on.
+    """
+    free = [(0.0, node) for node in range(total_nodes)]
+    schedule = []
+    for job in jobs:
+        if job["nodes"] > total_nodes:
+            raise ValueError(f"A job needs {job['nodes']} of {total_nodes} nodes")
+        taken = [heapq.heappop(free) for _ in range(job["nodes"])]
+        start = max(time for time, _ in taken)
+        end = start + runtime(job)
+        for _, node in taken:
+            heapq.heappush(free, (end, node))
+        hosts = sorted(node for _, node in taken)
+        schedule.append({**job, "start": start, "end": end, "hosts": hosts})
+    return schedule
+
+
+def lpt_order(jobs, runtime):
+    """
+    Jobs with the most (predicted) node seconds first.
+    """
+    return sorted(jobs, key=lambda job: runtime(job) * job["nodes"], reverse=True)
+
+
+def lpt(jobs, total_nodes, runtime):
+    return list_schedule(lpt_order(jobs, runtime), total_nodes, runtime)
+
+
+def makespan(schedule):
+    return max((job["end"] for job in schedule), default=0.0)
+
+
+def lower_bound(jobs, total_nodes, runtime):
+    """
+    No schedule is shorter than the longest job, or all the work spread evenly.
+    """
+    work = sum(runtime(job) * job["nodes"] for job in jobs) / total_nodes
+    return max([work] + [runtime(job) for job in jobs])
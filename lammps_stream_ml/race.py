@@ -0,0 +1,106 @@
+# A race of model variants (e.g., learning rates, PA C, and scalers) on one
+# stream. Every variant that is still in the race predicts each sample before
+# it learns from it, and after a rung of samples we keep the half with the
+# lowest (prequential) mean absolute error. The next rung is twice as long,
+# so each rung costs about the same, and we stop at the survivors. Learning
+# then costs what the survivors cost, and the race predicts with its leader.
+# It is one model to the server, so a learn is one request for all variants.
+
+import math
+
+from river import base
+
+
+def get_error(error):
+    """
+    A mean error for json (a variant that cannot predict has no error).
+    """
+    return error if error is not None and math.isfinite(error) else None
+
+
+class ModelRace(base.Regressor):
+    """
+    Successive halving of variants (by name) on the stream they learn from.
+
+    rung is the number of samples before the first halving, and each rung
+    keeps 1 / eta of the variants (at least survivors) for eta times as
+    many samples. The variants we are given are templates, and not trained.
+    """
+
+    def __init__(self, models, rung=10, eta=2, survivors=1):
+        self.models = models
+        self.rung = rung
+        self.eta = eta
+        self.survivors = survivors
+
+        self._models = {name: model.clone() for name, model in models.items()}
+        self._errors = {name: 0.0 for name in self._models}
+        self._seen = 0
+        self._budget = rung
+        self._best = next(iter(self._models))
+        self.history = []
+
+    @property
+    def leader(self):
+        """
+        The variant with the lowest error in this rung, or the last if it is new.
+        """
+        if self._seen < min(self.rung, self._budget) and self._best in self._models:
+            return self._best
+        return min(self._models, key=self._errors.get)
+
+    def learn_one(self, x, y):
+        for name, model in self._models.items():
+            pred = model.predict_one(x)
+            if pred is None or not math.isfinite(pred):
+                self._errors[name] = math.inf
+            else:
+                self._errors[name] += abs(y - pred)
+            model.learn_one(x, y)
+        self._seen += 1
+        if self._seen >= self._budget and len(self._models) > self.survivors:
+            self.halve()
+
+    def halve(self):
+        """
+        Keep the best 1 / eta of the variants, and give them a longer rung.
+        """
+        means = {name: error / self._seen for name, error in self._errors.items()}
+        ranked = sorted(means, key=means.get)
+        keep = max(self.survivors, math.ceil(len(ranked) / self.eta))
+        self.history.append(
+            {"samples": self._seen, "errors": means, "kept": ranked[:keep]}
+        )
+        self._models = {name: self._models[name] for name in ranked[:keep]}
+        self._errors = {name: 0.0 for name in self._models}
+        self._best = ranked[0]
+        self._seen = 0
+        self._budget *= self.eta
+
+    def predict_one(self, x):
+        return self._models[self.leader].predict_one(x)
+
+    def leaderboard(self):
+        """
+        The variants still in the race (by mean error in this rung) and rungs.
+        """
+        errors = {
+            name: get_error(error / self._seen) if self._seen else None
+            for name, error in self._errors.items()
+        }
+        history = [
+            {
+                **rung,
+                "errors": {name: get_error(e) for name, e in rung["errors"].items()},
+            }
+            for rung in self.history
+        ]
+        return {
+            "leader": self.leader,
+            "variants": len(self.models),
+            "rung": len(self.history),
+            "seen": self._seen,
+            "budget": self._budget if len(self._models) > self.survivors else None,
+            "alive": errors,
+            "history": history,
+        }
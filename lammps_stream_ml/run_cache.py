@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+# A content addressed cache of LAMMPS runs. The space of parameters is small,
+# so the same run comes up again, and each costs minutes on the cluster.
+# A run is keyed by everything that changes the result: the inputs, x, y, z,
+# the nodes and processes, and the digest of the container it runs in.
+
+import hashlib
+import json
+import os
+
+# Read containers in chunks of this size (bytes) to compute the digest
+chunk_size = 1024 * 1024
+
+
+class RunCache:
+    """
+    A directory of parsed results, one json file per run signature.
+
+    Each file has the signature, the fields parsed from the log and an
+    excerpt (the tail) of the output. We also count hits and misses, and
+    the time that hits saved us.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0.0
+        os.makedirs(self.root, exist_ok=True)
+
+    def container_digest(self, container):
+        """
+        The sha256 digest of a container, which we only compute once per file.
+
+        Containers are large, so we remember the digest for a path, size and
+        modified time in the cache.
+        """
+        stat = os.stat(container)
+        identity = {
+            "path": os.path.abspath(container),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+        }
+        marker = os.path.join(self.root, "digests", self.key(identity))
+        if os.path.exists(marker):
+            with open(marker, "r") as fd:
+                return fd.read().strip()
+
+        print(f"Computing digest of {container}, this only happens once")
+        hasher = hashlib.sha256()
+        with open(container, "rb") as fd:
+            for chunk in iter(lambda: fd.read(chunk_size), b""):
+                hasher.update(chunk)
+        digest = f"sha256:{hasher.hexdigest()}"
+        os.makedirs(os.path.dirname(marker), exist_ok=True)
+        with open(marker, "w") as fd:
+            fd.write(digest)
+        return digest
+
+    def key(self, signature):
+        """
+        The key for a signature is the sha256 of its (sorted) json.
+        """
+        content = json.dumps(signature, sort_keys=True)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, signature):
+        """
+        Get a cached result for a signature, or None.
+        """
+        path = self.path(self.key(signature))
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        with open(path, "r") as fd:
+            result = json.loads(fd.read())
+        self.hits += 1
+        self.saved += result["fields"].get("elapsed") or 0
+        return result
+
+    def set(self, signature, fields, tail):
+        """
+        Save the result for a signature.
+
+        We write to a temporary file and rename, so a crash cannot leave
+        a partial result behind.
+        """
+        path = self.path(self.key(signature))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        result = {"signature": signature, "fields": fields, "tail": list(tail)}
+        with open(f"{path}.tmp", "w") as fd:
+            fd.write(json.dumps(result, indent=4))
+        os.replace(f"{path}.tmp", path)
+
+    def iter_fields(self):
+        """
+        The fields of every cached run, e.g., to train new models on.
+        """
+        for prefix in sorted(os.listdir(self.root)):
+            directory = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(directory):
+                continue
+            for filename in sorted(os.listdir(directory)):
+                if not filename.endswith(".json"):
+                    continue
+                with open(os.path.join(directory, filename), "r") as fd:
+                    yield json.loads(fd.read())["fields"]
+
+    def show(self):
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0
+        print(f"\n🗃️  Run cache at {self.root}")
+        print(
+            f"     hits: {self.hits} misses: {self.misses} ({rate:.1f}% hit rate), "
+            f"saved {self.saved:.1f} seconds of LAMMPS"
+        )
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+
+# Samplers to choose the next LAMMPS parameters (x, y, z) to run.
+# Each simulation is expensive, so instead of choosing each dimension
+# uniformly at random we can spread points over the space (latin hypercube,
+# sobol) or ask the model where it is least certain (uncertainty). The grid
+# sampler visits every point of the space once (in shuffled order) before
+# any point is repeated.
+
+import json
+import math
+import os
+import random
+
+# Direction numbers (s, a, m) for dimensions after the first from Joe and Kuo,
+# https://web.maths.unsw.edu.au/~fkuo/sobol/new-joe-kuo-6.21201
+sobol_directions = [
+    (1, 0, [1]),
+    (2, 1, [1, 3]),
+    (3, 1, [1, 3, 1]),
+    (3, 2, [1, 1, 1]),
+    (4, 1, [1, 1, 3, 3]),
+]
+
+# Number of bits for sobol points (we can generate 2^30 before repeating)
+sobol_bits = 30
+
+# Rounds of the feistel network that shuffles the grid
+feistel_rounds = 4
+mask64 = (1 << 64) - 1
+
+
+class Sampler:
+    """
+    Base sampler over a discrete space.
+
+    The space is a dictionary of names (e.g., x) to the ordered list of values
+    allowed for each. Each call to sample returns a dictionary with one value
+    for each name. get_state and set_state save and restore where we are
+    (as json serializable data) so a campaign can be resumed.
+    """
+
+    name = "random"
+
+    def __init__(self, space, seed=None):
+        self.space = space
+        self.names = list(space)
+        self.rng = random.Random(seed)
+
+    def sample(self):
+        return {name: self.rng.choice(self.space[name]) for name in self.names}
+
+    def get_state(self):
+        version, state, gauss = self.rng.getstate()
+        return {"rng": [version, list(state), gauss]}
+
+    def set_state(self, state):
+        version, rng_state, gauss = state["rng"]
+        self.rng.setstate((version, tuple(rng_state), gauss))
+
+    def from_unit(self, point):
+        """
+        Map a point in the unit cube to values in the space.
+        """
+        values = {}
+        for name, u in zip(self.names, point):
+            choices = self.space[name]
+            values[name] = choices[min(int(u * len(choices)), len(choices) - 1)]
+        return values
+
+
+class LatinHypercubeSampler(Sampler):
+    """
+    Latin hypercube sampling, in batches of n points.
+
+    In each batch every dimension is cut into n strata, and each stratum
+    is used by exactly one point, so the batch covers each range evenly.
+    """
+
+    name = "lhs"
+
+    def __init__(self, space, n=20, seed=None):
+        super().__init__(space, seed)
+        self.n = max(1, n)
+        self.batch = []
+
+    def new_batch(self):
+        strata = []
+        for _ in self.names:
+            order = list(range(self.n))
+            self.rng.shuffle(order)
+            strata.append(order)
+        self.batch = [
+            [(order[i] + self.rng.random()) / self.n for order in strata]
+            for i in range(self.n)
+        ]
+
+    def sample(self):
+        if not self.batch:
+            self.new_batch()
+        return self.from_unit(self.batch.pop())
+
+    def get_state(self):
+        return {**super().get_state(), "batch": self.batch}
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.batch = state["batch"]
+
+
+class SobolSampler(Sampler):
+    """
+    Sobol low discrepancy sequence, with a random shift.
+
+    We generate points with gray code ordering, and shift them (modulo 1)
+    by a random offset so that different seeds give different points.
+    """
+
+    name = "sobol"
+
+    def __init__(self, space, seed=None):
+        super().__init__(space, seed)
+        if len(self.names) > len(sobol_directions) + 1:
+            raise ValueError(
+                f"Sobol sampling supports up to {len(sobol_directions) + 1} dimensions"
+            )
+        self.directions = [self.get_directions(d) for d in range(len(self.names))]
+        self.state = [0] * len(self.names)
+        self.shift = [self.rng.random() for _ in self.names]
+        self.index = 0
+
+    def get_directions(self, dim):
+        """
+        Direction numbers v_k (scaled by 2^bits) for a dimension.
+        """
+        if dim == 0:
+            return [1 << (sobol_bits - k) for k in range(1, sobol_bits + 1)]
+        s, a, m = sobol_directions[dim - 1]
+        v = [m[k] << (sobol_bits - k - 1) for k in range(s)]
+        for k in range(s, sobol_bits):
+            value = v[k - s] ^ (v[k - s] >> s)
+            for j in range(1, s):
+                value ^= ((a >> (s - 1 - j)) & 1) * v[k - j]
+            v.append(value)
+        return v
+
+    def sample(self):
+        # The first point of the sequence is the origin, which we skip
+        self.index += 1
+        # Gray code order flips the direction for the lowest set bit of the index
+        bit = (self.index & -self.index).bit_length() - 1
+        point = []
+        for d, directions in enumerate(self.directions):
+            self.state[d] ^= directions[bit]
+            point.append((self.state[d] / (1 << sobol_bits) + self.shift[d]) % 1)
+        return self.from_unit(point)
+
+    def get_state(self):
+        return {"index": self.index, "state": self.state, "shift": self.shift}
+
+    def set_state(self, state):
+        self.index = state["index"]
+        self.state = state["state"]
+        self.shift = state["shift"]
+
+
+def mix(value):
+    """
+    Scramble the bits of a 64 bit integer (the splitmix64 finalizer).
+    """
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & mask64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & mask64
+    return value ^ (value >> 31)
+
+
+class GridSampler(Sampler):
+    """
+    Sample the grid of all points without replacement, in shuffled order.
+
+    We never build the list of points. A feistel network gives a random
+    permutation of the indices 0..size-1, so the position in the permutation
+    is all we need to remember. With a checkpoint file the position is saved
+    as we go, and an interrupted campaign continues where it stopped. When
+    every point has been visited we start again with a new permutation.
+    """
+
+    name = "grid"
+
+    def __init__(self, space, seed=None, checkpoint=None):
+        super().__init__(space, seed)
+        self.size = math.prod(len(space[name]) for name in self.names)
+        self.checkpoint = checkpoint
+        self.position = 0
+        self.epoch = 0
+        self.keys = self.new_keys()
+        if checkpoint and os.path.exists(checkpoint):
+            self.load()
+
+        # Half of the smallest even number of bits that covers the grid
+        self.half = ((self.size - 1).bit_length() + 1) // 2
+        self.half_mask = (1 << self.half) - 1
+
+    def new_keys(self):
+        return [self.rng.getrandbits(64) for _ in range(feistel_rounds)]
+
+    def load(self):
+        with open(self.checkpoint, "r") as fd:
+            state = json.loads(fd.read())
+        if state["space"] != self.space:
+            raise ValueError(
+                f"The grid in {self.checkpoint} is for a different space, "
+                "remove it or choose another checkpoint."
+            )
+        self.position = state["position"]
+        self.epoch = state["epoch"]
+        self.keys = state["keys"]
+        print(f"Resuming grid at point {self.position} of {self.size}")
+
+    def save(self):
+        if not self.checkpoint:
+            return
+        state = {
+            "space": self.space,
+            "position": self.position,
+            "epoch": self.epoch,
+            "keys": self.keys,
+        }
+        with open(f"{self.checkpoint}.tmp", "w") as fd:
+            fd.write(json.dumps(state))
+        os.replace(f"{self.checkpoint}.tmp", self.checkpoint)
+
+    def permute(self, index):
+        """
+        Map a position to a grid index with the feistel network.
+
+        The network permutes a domain of 2^(2*half) >= size, so we "cycle walk"
+        (apply it again) until we land inside the grid.
+        """
+        while True:
+            left, right = index >> self.half, index & self.half_mask
+            for key in self.keys:
+                left, right = right, left ^ (mix(right ^ key) & self.half_mask)
+            index = (left << self.half) | right
+            if index < self.size:
+                return index
+
+    def from_index(self, index):
+        """
+        Map a grid index to a point (the last name changes fastest).
+        """
+        point = {}
+        for name in reversed(self.names):
+            index, offset = divmod(index, len(self.space[name]))
+            point[name] = self.space[name][offset]
+        return {name: point[name] for name in self.names}
+
+    def sample(self):
+        if self.position >= self.size:
+            print(f"Every point of the grid ({self.size}) was sampled, starting again")
+            self.position = 0
+            self.epoch += 1
+            self.keys = self.new_keys()
+
+        # We save the position of the point in progress, so it is run again if interrupted
+        self.save()
+        index = self.permute(self.position)
+        self.position += 1
+        return self.from_index(index)
+
+    def get_state(self):
+        return {
+            **super().get_state(),
+            "position": self.position,
+            "epoch": self.epoch,
+            "keys": self.keys,
+        }
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.position = state["position"]
+        self.epoch = state["epoch"]
+        self.keys = state["keys"]
+
+
+class UncertaintySampler(Sampler):
+    """
+    Choose the candidate point where the model is least certain.
+
+    score is a function that takes a list of candidate points and returns the
+    predictive standard deviation for each (e.g., from BayesianLinearRegression).
+    We draw the first points from a latin hypercube (there is nothing to be
+    uncertain about yet), and after that score a random pool of candidates.
+    """
+
+    name = "uncertainty"
+
+    def __init__(self, space, score, candidates=256, warmup=5, seed=None):
+        super().__init__(space, seed)
+        self.score = score
+        self.candidates = candidates
+        self.warmup = LatinHypercubeSampler(space, n=warmup, seed=seed)
+        self.remaining = warmup
+        self.seen = set()
+
+    def sample(self):
+        if self.remaining > 0:
+            self.remaining -= 1
+            point = self.warmup.sample()
+        else:
+            pool = [Sampler.sample(self) for _ in range(self.candidates)]
+            pool = [p for p in pool if self.key(p) not in self.seen] or pool
+            sigmas = self.score(pool)
+            point = max(zip(pool, sigmas), key=lambda item: item[1] or 0)[0]
+        self.seen.add(self.key(point))
+        return point
+
+    def key(self, point):
+        return tuple(point[name] for name in self.names)
+
+    def get_state(self):
+        return {
+            **super().get_state(),
+            "remaining": self.remaining,
+            "warmup": self.warmup.get_state(),
+            "seen": [list(key) for key in self.seen],
+        }
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.remaining = state["remaining"]
+        self.warmup.set_state(state["warmup"])
+        self.seen = {tuple(key) for key in state["seen"]}
+
+
+samplers = {
+    "grid": GridSampler,
+    "random": Sampler,
+    "lhs": LatinHypercubeSampler,
+    "sobol": SobolSampler,
+    "uncertainty": UncertaintySampler,
+}
+
+
+def get_sampler(name, space, n=20, score=None, seed=None, checkpoint=None):
+    """
+    Get a sampler by name. n is the expected number of samples.
+    """
+    if name == "grid":
+        return GridSampler(space, seed=seed, checkpoint=checkpoint)
+    if name == "lhs":
+        return LatinHypercubeSampler(space, n=n, seed=seed)
+    if name == "uncertainty":
+        if score is None:
+            raise ValueError("The uncertainty sampler requires a score function")
+        return UncertaintySampler(
+            space, score, warmup=max(2, int(math.sqrt(n))), seed=seed
+        )
+    return samplers[name](space, seed=seed)
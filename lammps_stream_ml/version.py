@@ -0,0 +1,21 @@
+__version__ = "0.0.1"
+NAME = "lammps-stream-ml"
+PACKAGE_URL = "https://github.com/converged-computing/lammps-stream-ml"
+KEYWORDS = "lammps, online learning, river, flux"
+DESCRIPTION = "Run LAMMPS and stream the results to online machine learning models"
+LICENSE = "LICENSE"
+
+################################################################################
+# Global requirements
+
+# The client and river are only imported by the commands that need them
+INSTALL_REQUIRES = (
+    ("requests", {"min_version": None}),
+    ("riverapi", {"min_version": None}),
+    ("river", {"min_version": None}),
+)
+
+# Writing and reading parquet results
+PARQUET_REQUIRES = (("pyarrow", {"min_version": None}),)
+
+INSTALL_REQUIRES_ALL = INSTALL_REQUIRES + PARQUET_REQUIRES
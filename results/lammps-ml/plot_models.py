@@ -1,37 +1,236 @@
 #!/usr/bin/env python3
 
-import matplotlib.pyplot as plt
+# Plot predicted vs. actual values, residuals and calibration for every model
+# in a predict result (json, parquet or csv). We read the results in one pass,
+# in batches of only the columns we need, and keep a uniform random sample of
+# at most --max-points per model, so this works for very large campaigns.
+# When there are many points we draw density (hexbin) instead of a scatter.
+
+# python3 plot_models.py lammps-predict.json
+
+import argparse
 import os
-import json
+import sys
+
+import matplotlib.pyplot as plt
+import numpy
 
 here = os.path.dirname(os.path.abspath(__file__))
-results = os.path.join(here, "lammps-predict.json")
-with open(results, 'r') as fd:
-    results = json.loads(fd.read())
-
-dims = results['dims']
-y_pred = results['y_pred']
-y_true = results['y_true']
-
-for key in ['dims', 'y_pred', 'y_true']:
-    del results[key]
-    
-colors = ['#e74c3c', '#2ecc71', '#286bc8']
-for i, model_name in enumerate(results):
-    color = colors[i]
-    data = results[model_name]
-    pred = y_pred[model_name]
-    title = " ".join([x.capitalize() for x in data['model_type'].split('-')])
-
-    # Save file to...
-    save_fig = data['model_name']+ '-' + data['model_type'] + '.png'
-
-    # Plot the results
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.grid(alpha=0.75)
-    ax.scatter(pred, y_true, lw=3, color=color, alpha=0.8, label=title, s=2)
-    ax.set_ylabel('Actual time (seconds)')
-    ax.set_xlabel('Predicted time (seconds)')
-    ax.set_title(title)
-    fig.savefig(save_fig)
-    plt.close()
+
+# The loader for results (json, parquet or csv) is in the runner package,
+# which we can also use from a clone without installing
+sys.path.insert(0, os.path.join(here, "..", ".."))
+from lammps_stream_ml import columnar  # noqa
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="Plot LAMMPS Model Predictions",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument(
+        "results",
+        nargs="?",
+        help="predict results (json, parquet or csv)",
+        default=os.path.join(here, "lammps-predict.json"),
+    )
+    parser.add_argument(
+        "--outdir",
+        help="directory to save plots to",
+        default=os.getcwd(),
+    )
+    parser.add_argument(
+        "--max-points",
+        dest="max_points",
+        help="keep a random sample of at most this many points per model",
+        default=50000,
+        type=int,
+    )
+    parser.add_argument(
+        "--hexbin",
+        help="draw density (hexbin) instead of points above this many",
+        default=5000,
+        type=int,
+    )
+    parser.add_argument(
+        "--bins",
+        help="number of bins (quantiles of the prediction) for calibration",
+        default=20,
+        type=int,
+    )
+    parser.add_argument(
+        "--seed",
+        help="random seed for sampling points",
+        type=int,
+    )
+    return parser
+
+
+class ModelSample:
+    """
+    A uniform random sample of (predicted, actual) for one model.
+
+    Each row gets a random key and we keep the rows with the smallest keys,
+    which is a uniform sample of everything seen, updated a batch at a time.
+    We also count every row, and the sums for the mean and spread of residuals.
+    """
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.keys = numpy.empty(0)
+        self.pred = numpy.empty(0)
+        self.true = numpy.empty(0)
+        self.count = 0
+        self.residual_sum = 0.0
+        self.residual_squares = 0.0
+
+    def add(self, pred, true):
+        residuals = true - pred
+        self.count += len(pred)
+        self.residual_sum += residuals.sum()
+        self.residual_squares += (residuals**2).sum()
+
+        keys = numpy.concatenate([self.keys, self.rng.random(len(pred))])
+        pred = numpy.concatenate([self.pred, pred])
+        true = numpy.concatenate([self.true, true])
+        if len(keys) > self.size:
+            keep = numpy.argpartition(keys, self.size)[: self.size]
+            keys, pred, true = keys[keep], pred[keep], true[keep]
+        self.keys, self.pred, self.true = keys, pred, true
+
+    @property
+    def residual_mean(self):
+        return self.residual_sum / self.count
+
+    @property
+    def residual_std(self):
+        variance = self.residual_squares / self.count - self.residual_mean**2
+        return numpy.sqrt(max(variance, 0))
+
+
+def read_samples(args):
+    """
+    Read the results in one pass, sampling (predicted, actual) for each model.
+    """
+    rng = numpy.random.default_rng(args.seed)
+    samples = {}
+    columns = ["model", "y_true", "y_pred"]
+    for batch in columnar.iter_batches(args.results, columns=columns):
+        models = numpy.asarray(batch["model"])
+        pred = numpy.asarray(batch["y_pred"], dtype=float)
+        true = numpy.asarray(batch["y_true"], dtype=float)
+
+        # Models that did not have a prediction are skipped
+        valid = ~numpy.isnan(pred) & ~numpy.isnan(true)
+        for model_name in numpy.unique(models):
+            rows = valid & (models == model_name)
+            if model_name not in samples:
+                samples[model_name] = ModelSample(args.max_points, rng)
+            samples[model_name].add(pred[rows], true[rows])
+    return samples
+
+
+def plot_points(ax, x, y, color, args):
+    """
+    Scatter the points, or show their density if there are many.
+    """
+    if len(x) > args.hexbin:
+        hexes = ax.hexbin(x, y, gridsize=60, bins="log", mincnt=1, cmap="viridis")
+        plt.colorbar(hexes, ax=ax, label="count (log)")
+    else:
+        ax.scatter(x, y, lw=3, color=color, alpha=0.8, s=2)
+
+
+def get_calibration(sample, bins):
+    """
+    Mean predicted and actual values in quantile bins of the prediction.
+    """
+    edges = numpy.unique(numpy.quantile(sample.pred, numpy.linspace(0, 1, bins + 1)))
+    if len(edges) < 2:
+        return sample.pred[:1], sample.true[:1]
+    which = numpy.searchsorted(edges, sample.pred, side="right") - 1
+    which = numpy.clip(which, 0, len(edges) - 2)
+    counts = numpy.bincount(which, minlength=len(edges) - 1)
+    used = counts > 0
+    sums_pred = numpy.bincount(which, weights=sample.pred, minlength=len(edges) - 1)
+    sums_true = numpy.bincount(which, weights=sample.true, minlength=len(edges) - 1)
+    return sums_pred[used] / counts[used], sums_true[used] / counts[used]
+
+
+def get_title(model_name, summary):
+    model_type = summary.get(model_name, {}).get("model_type")
+    title = " ".join([x.capitalize() for x in (model_type or model_name).split("-")])
+    prefix = "-".join([x for x in [model_name, model_type] if x])
+    return title, prefix
+
+
+def main():
+    parser = get_parser()
+    args, _ = parser.parse_known_args()
+
+    samples = read_samples(args)
+    summary = columnar.load_summary(args.results)
+    os.makedirs(args.outdir, exist_ok=True)
+
+    # As many colors as we have models
+    colors = plt.get_cmap("tab10")
+
+    # Calibration for all models goes on one plot
+    fig_cal, ax_cal = plt.subplots(figsize=(10, 6))
+    for i, (model_name, sample) in enumerate(samples.items()):
+        if not sample.count:
+            continue
+        color = colors(i % colors.N)
+        title, prefix = get_title(model_name, summary)
+        note = f"{sample.count} points" + (
+            f" ({len(sample.pred)} sampled)" if len(sample.pred) < sample.count else ""
+        )
+        print(
+            f"{model_name}: {note}, residual mean {sample.residual_mean:.3f} "
+            f"std {sample.residual_std:.3f}"
+        )
+        low = min(sample.pred.min(), sample.true.min())
+        high = max(sample.pred.max(), sample.true.max())
+
+        # Predicted vs. actual
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.grid(alpha=0.75)
+        plot_points(ax, sample.pred, sample.true, color, args)
+        ax.plot([low, high], [low, high], color="#777777", lw=1, ls="--")
+        ax.set_ylabel("Actual time (seconds)")
+        ax.set_xlabel("Predicted time (seconds)")
+        ax.set_title(f"{title} ({note})")
+        fig.savefig(os.path.join(args.outdir, prefix + ".png"))
+        plt.close(fig)
+
+        # Residuals vs. predicted
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.grid(alpha=0.75)
+        plot_points(ax, sample.pred, sample.true - sample.pred, color, args)
+        ax.axhline(0, color="#777777", lw=1, ls="--")
+        ax.set_ylabel("Residual, actual - predicted (seconds)")
+        ax.set_xlabel("Predicted time (seconds)")
+        ax.set_title(
+            f"{title} residuals "
+            f"(mean {sample.residual_mean:.2f}, std {sample.residual_std:.2f})"
+        )
+        fig.savefig(os.path.join(args.outdir, prefix + "-residuals.png"))
+        plt.close(fig)
+
+        # Calibration, the mean actual for quantile bins of the prediction
+        mean_pred, mean_true = get_calibration(sample, args.bins)
+        ax_cal.plot(mean_pred, mean_true, marker="o", color=color, label=title)
+
+    ax_cal.grid(alpha=0.75)
+    ax_cal.axline((0, 0), slope=1, color="#777777", lw=1, ls="--")
+    ax_cal.set_ylabel("Mean actual time (seconds)")
+    ax_cal.set_xlabel("Mean predicted time (seconds)")
+    ax_cal.set_title("Calibration")
+    ax_cal.legend()
+    fig_cal.savefig(os.path.join(args.outdir, "calibration.png"))
+    plt.close(fig_cal)
+
+
+if __name__ == "__main__":
+    main()
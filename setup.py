@@ -0,0 +1,58 @@
+import os
+
+from setuptools import find_packages, setup
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_lookup():
+    """
+    Get the version, requirements and metadata without importing the package.
+    """
+    lookup = {}
+    with open(os.path.join(here, "lammps_stream_ml", "version.py")) as fd:
+        exec(fd.read(), lookup)
+    return lookup
+
+
+def get_requirements(lookup=None, key="INSTALL_REQUIRES"):
+    """
+    Requirements for a key in the lookup, with a minimum version if one is set.
+    """
+    requirements = []
+    for module_name, module in (lookup or get_lookup())[key]:
+        if module.get("min_version"):
+            requirements.append(f"{module_name}>={module['min_version']}")
+        else:
+            requirements.append(module_name)
+    return requirements
+
+
+if __name__ == "__main__":
+    lookup = get_lookup()
+    with open(os.path.join(here, "README.md")) as fd:
+        long_description = fd.read()
+
+    setup(
+        name=lookup["NAME"],
+        version=lookup["__version__"],
+        url=lookup["PACKAGE_URL"],
+        license=lookup["LICENSE"],
+        description=lookup["DESCRIPTION"],
+        long_description=long_description,
+        long_description_content_type="text/markdown",
+        keywords=lookup["KEYWORDS"],
+        packages=find_packages(include=["lammps_stream_ml", "lammps_stream_ml.*"]),
+        include_package_data=True,
+        zip_safe=False,
+        install_requires=get_requirements(lookup),
+        extras_require={
+            "parquet": get_requirements(lookup, "PARQUET_REQUIRES"),
+            "all": get_requirements(lookup, "INSTALL_REQUIRES_ALL"),
+        },
+        entry_points={
+            "console_scripts": [
+                "lammps-stream-ml=lammps_stream_ml.cli:main",
+            ]
+        },
+    )